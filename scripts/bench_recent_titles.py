@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+import json
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from post_manifest import PostManifest, extract_title  # noqa: E402
+
+# Vertailu: vanha get_recent_titles (jokainen artikkeli luetaan kokonaan ja
+# lajitellaan) vs. manifestin lajitellut rivit (ensimmäinen kutsu lajittelee,
+# seuraavat lukevat vain uusimmat LIMIT riviä).
+# Ajo: python scripts/bench_recent_titles.py [koko ...]
+
+SIZES = (600, 10_000, 100_000)
+# Vanha tapa lukee koko arkiston; suurimmalla koolla se ohitetaan oletuksena.
+FULL_READ_MAX = 10_000
+CATEGORIES = ("talous", "ruoka", "yhteiskunta", "teema")
+LIMIT = 40
+REPEAT = 3
+
+BODY = "<p>" + "Lorem ipsum dolor sit amet. " * 150 + "</p>\n"
+DATED_NAME_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def make_posts(root: Path, n: int) -> Path:
+    """Kirjoita n artikkelia ja niitä vastaava manifesti; palauttaa manifestin polun."""
+    today = date.today()
+    posts_dir = root / "posts"
+    for kind in CATEGORIES:
+        (posts_dir / kind).mkdir(parents=True, exist_ok=True)
+    rows = {}
+    for i in range(n):
+        kind = CATEGORIES[i % len(CATEGORIES)]
+        day = (today - timedelta(days=i // len(CATEGORIES))).isoformat()
+        path = posts_dir / kind / f"{day}-{kind}-{i}.html"
+        path.write_text(
+            f"<!doctype html>\n<html lang=\"fi\">\n<head>\n<title>Artikkeli {i}</title>\n</head>\n"
+            f"<body>\n<h1>Artikkeli {i}</h1>\n{BODY}</body>\n</html>\n",
+            encoding="utf-8",
+        )
+        rows[path.relative_to(root).as_posix()] = {
+            "category": kind, "date": day, "title": f"Artikkeli {i}", "summary": "", "sha256": "", "size": 0,
+        }
+    manifest_path = root / "post_manifest.json"
+    manifest_path.write_text(json.dumps({"posts": rows}), encoding="utf-8")
+    return manifest_path
+
+
+def full_read(posts_dir: Path) -> list[str]:
+    items = []
+    for p in posts_dir.rglob("*.html"):
+        if not DATED_NAME_RE.match(p.name):
+            continue
+        items.append((p.name[:10], str(p), extract_title(p.read_text(encoding="utf-8"))))
+    items.sort(reverse=True)
+    return [title for _, _, title in items[:LIMIT]]
+
+
+def manifest_titles(manifest: PostManifest) -> list[str]:
+    return [entry["title"] for _, entry in manifest.posts(limit=LIMIT)]
+
+
+def best_of(fn, *args) -> tuple[float, list]:
+    best = float("inf")
+    result = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'artikkeleita':>12} {'koko luku':>12} {'1. kutsu':>11} {'seuraavat':>11}")
+    for n in sizes:
+        work = Path(tempfile.mkdtemp(prefix="recent-titles-"))
+        try:
+            manifest = PostManifest.load(make_posts(work, n), work, work / "posts")
+            start = time.perf_counter()
+            manifest_titles(manifest)
+            first_time = time.perf_counter() - start
+            cached_time, titles = best_of(manifest_titles, manifest)
+            if n <= FULL_READ_MAX:
+                full_time, full_titles = best_of(full_read, work / "posts")
+                assert full_titles == titles
+                full_col = f"{full_time * 1000:>9.1f} ms"
+            else:
+                full_col = f"{'-':>12}"
+            print(f"{n:>12} {full_col} {first_time * 1000:>8.1f} ms {cached_time * 1000:>8.3f} ms")
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
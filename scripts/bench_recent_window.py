@@ -0,0 +1,76 @@
+from datetime import date, datetime, timedelta
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import news_store  # noqa: E402
+
+# Vertailu: vanha tapa (strptime jokaiselle historian riville) vs. 7 päivän
+# ikkuna indeksoidusta published-sarakkeesta (news_store.items_since).
+# Ajo: python scripts/bench_recent_window.py
+
+SIZES = (2_000, 50_000, 500_000)
+WINDOW_DAYS = 7
+REPEAT = 5
+
+
+def make_history(n: int, today: date) -> list[dict]:
+    rng = random.Random(n)
+    # Noin 40 uutista päivässä, joten 7 päivän ikkunan koko pysyy samana
+    # historian koosta riippumatta.
+    span = max(WINDOW_DAYS, n // 40)
+    return [
+        {
+            "title": f"Uutinen {i}",
+            "link": f"https://example.com/{i}",
+            "published": (today - timedelta(days=rng.randrange(span))).isoformat(),
+        }
+        for i in range(n)
+    ]
+
+
+def full_scan(items: list[dict], cutoff: date) -> list[dict]:
+    out = []
+    for item in items:
+        try:
+            d = datetime.strptime(item.get("published", "1970-01-01"), "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        if d >= cutoff:
+            out.append(item)
+    return out
+
+
+def best_of(fn, *args) -> tuple[float, int]:
+    best = float("inf")
+    result = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, len(result)
+
+
+def main() -> None:
+    today = date.today()
+    cutoff = today - timedelta(days=WINDOW_DAYS)
+
+    print(f"{'historia':>10} {'ikkuna':>7} {'täysi läpikäynti':>18} {'ikkuna (SQLite-indeksi)':>24}")
+    for n in SIZES:
+        items = make_history(n, today)
+        scan_time, scan_count = best_of(full_scan, items, cutoff)
+
+        conn = news_store.open_store(Path(":memory:"))
+        news_store.add_items(conn, items)
+        window_time, window_count = best_of(news_store.items_since, conn, cutoff.isoformat())
+        conn.close()
+        assert window_count == scan_count
+
+        print(f"{n:>10} {window_count:>7} {scan_time * 1000:>15.2f} ms {window_time * 1000:>21.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from post_similarity import SimilarityIndex  # noqa: E402
+
+# SimilarityIndex: painojen laskenta latauksessa ja top-k-kyselyn aika
+# synteettisellä korpuksella, jossa termien yleisyys noudattaa Zipfin lakia.
+# Ajo: python scripts/bench_related_posts.py [koko ...]
+
+SIZES = (600, 10_000, 50_000)
+VOCABULARY = 40_000
+TERMS_PER_DOC = 250
+QUERIES = 20
+K = 5
+
+
+def make_counts(rng: random.Random, weights: list[float]) -> dict[int, int]:
+    counts: dict[int, int] = {}
+    for f in rng.choices(range(VOCABULARY), weights=weights, k=TERMS_PER_DOC * 2):
+        counts[f] = counts.get(f, 0) + 1
+    return counts
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    weights = [1.0 / (rank + 1) for rank in range(VOCABULARY)]
+    print(f"{'artikkeleita':>12} {'painojen laskenta':>18} {'kysely (ka.)':>13}")
+    for n in sizes:
+        rng = random.Random(n)
+        index = SimilarityIndex(Path("/dev/null"))
+        for i in range(n):
+            counts = make_counts(rng, weights)
+            features = sorted(counts)
+            index._docs[f"posts/{i}.html"] = {"sha256": "", "f": features, "c": [counts[f] for f in features]}
+
+        start = time.perf_counter()
+        index._rebuild()
+        build_time = time.perf_counter() - start
+
+        queries = [make_counts(rng, weights) for _ in range(QUERIES)]
+        start = time.perf_counter()
+        for counts in queries:
+            index.query_counts(counts, K)
+        query_time = (time.perf_counter() - start) / QUERIES
+
+        print(f"{n:>12} {build_time * 1000:>15.0f} ms {query_time * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import time
+
+
+# Inkrementaalisen koonnin riippuvuusgraafi. Jokaisella kohteella (esim.
+# rss.xml) on joukko nimettyjä syötteitä ja niiden sormenjäljet: tiedostojen
+# sisällön tiiviste, manifestin rivit, uutiskannan sormenjälki. Kohde kootaan
+# uudelleen vain, jos jokin sormenjälki on muuttunut edellisestä koonnista tai
+# tuotostiedosto puuttuu tai on muuttunut koonnin ulkopuolella. Tila
+# tallennetaan tiedostoon data/build_state.json, jonka workflow committaa.
+
+ROOT = Path(__file__).resolve().parents[1]
+STATE_PATH = ROOT / "data" / "build_state.json"
+STATE_VERSION = 1
+
+# --explain näyttää kohteesta enintään näin monta muuttunutta syötettä.
+EXPLAIN_LIMIT = 5
+
+MISSING = "puuttuu"
+
+
+def fingerprint(data: bytes | str) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def write_if_changed(path: Path, text: str) -> bool:
+    """Kirjoita tiedosto vain, jos sisältö muuttuu (mtime ja CDN-välimuistit säilyvät)."""
+    data = text.encode("utf-8")
+    try:
+        if path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
+class BuildGraph:
+    """{kohde: {syötteet, tuotokset}} -tila ja päätös siitä, mitkä kohteet kootaan."""
+
+    def __init__(self, state_path: Path = STATE_PATH, root: Path = ROOT, explain: bool = False):
+        self.state_path = state_path
+        self.root = root
+        self.explain = explain
+        self._targets: dict[str, dict] = {}
+        self._dirty = False
+        self.built: list[str] = []
+        self.skipped: list[str] = []
+        if state_path.exists():
+            try:
+                with state_path.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict) and data.get("version") == STATE_VERSION:
+                    self._targets = data.get("targets", {})
+            except Exception:
+                self._targets = {}
+
+    def key(self, path: Path) -> str:
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def file(self, path: Path) -> str:
+        try:
+            return fingerprint(path.read_bytes())
+        except OSError:
+            return MISSING
+
+    def files(self, paths) -> dict[str, str]:
+        return {self.key(p): self.file(p) for p in paths}
+
+    def reasons(self, target: str, inputs: dict[str, str], outputs=()) -> list[str]:
+        """Miksi kohde pitää koota; tyhjä lista = ajan tasalla."""
+        record = self._targets.get(target)
+        if record is None:
+            return ["ei aiempaa koontia"]
+
+        reasons = []
+        recorded_outputs = record.get("outputs", {})
+        for path in outputs:
+            key = self.key(path)
+            current = self.file(path)
+            if current == MISSING:
+                reasons.append(f"{key} puuttuu")
+            elif current != recorded_outputs.get(key):
+                reasons.append(f"{key} muuttunut koonnin ulkopuolella")
+
+        old = record.get("inputs", {})
+        changed = [f"{k} lisätty" for k in inputs if k not in old]
+        changed += [f"{k} muuttui" for k, v in inputs.items() if k in old and old[k] != v]
+        changed += [f"{k} poistettu" for k in old if k not in inputs]
+        if len(changed) > EXPLAIN_LIMIT:
+            changed = changed[:EXPLAIN_LIMIT] + [f"ja {len(changed) - EXPLAIN_LIMIT} muuta"]
+        return reasons + changed
+
+    def build(self, target: str, inputs, recipe, outputs=()) -> bool:
+        """Aja recipe(), jos kohteen syötteet tai tuotokset ovat muuttuneet.
+
+        inputs on funktio, joka palauttaa {syöte: sormenjälki}. Se kutsutaan
+        uudelleen koonnin jälkeen, joten paikan päällä päivitettävä tiedosto
+        (esim. index.html) voi olla sekä syöte että tuotos.
+        """
+        reasons = self.reasons(target, inputs(), outputs)
+        if not reasons:
+            self.skipped.append(target)
+            if self.explain:
+                print(f"  {target}: ajan tasalla")
+            return False
+
+        if self.explain:
+            print(f"  {target}: kootaan, koska {'; '.join(reasons)}")
+        recipe()
+        self._targets[target] = {
+            "inputs": inputs(),
+            "outputs": {self.key(p): self.file(p) for p in outputs},
+        }
+        self._dirty = True
+        self.built.append(target)
+        return True
+
+    def forget(self, target: str) -> None:
+        """Unohda kohde, jonka tuotos on poistettu."""
+        if self._targets.pop(target, None) is not None:
+            self._dirty = True
+
+    def save(self) -> bool:
+        if not self._dirty:
+            return False
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.state_path.open("w", encoding="utf-8") as f:
+            json.dump({"version": STATE_VERSION, "targets": self._targets}, f,
+                      ensure_ascii=False, indent=1, sort_keys=True)
+        self._dirty = False
+        return True
+
+    def summary(self, started: float) -> str:
+        total = len(self.built) + len(self.skipped)
+        return (f"Koonti: {len(self.built)}/{total} kohdetta koottu uudelleen "
+                f"({time.perf_counter() - started:.2f} s)")
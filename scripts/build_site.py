@@ -0,0 +1,124 @@
+from datetime import datetime
+from pathlib import Path
+import argparse
+import re
+import time
+
+from build_graph import STATE_PATH, BuildGraph
+import feeds
+import index_pages
+import sitemap
+from post_manifest import ROOT, PostManifest
+from site_template import post_template_sources, rerender_site
+
+
+# Sivuston koonti: kaikki tuotokset, jotka lasketaan artikkeleista, uutiskannasta,
+# pohjista ja tyylitiedostosta. Jokainen tuotos on BuildGraphin kohde, joten ajo
+# koskee vain niihin, joiden syötteet ovat muuttuneet:
+#
+#   artikkelisivut           <- partials/ (artikkelipohja), scripts/site_template.py
+#   uutisiasuomesta*.html    <- uutiskanta (vuodet, 7 päivän ikkuna)
+#   rss.xml, feeds/*         <- syötteen 20-50 uusinta artikkelia (päivä, otsikko, tiivistelmä)
+#   index.html, talous.html… <- 30-59 uusinta artikkelia, uusimman arkistosivun numero
+#                               (index.html: myös assets/styles.css)
+#   page/N.html, talous/page/N.html…
+#                            <- sivun 30 artikkelia, naapurisivut, partials/index-page.html
+#   sitemaps/*.xml           <- ryhmän sivujen osoitteet ja lastmod (data/sitemap_state.json)
+#   sitemap.xml              <- osien lastmod
+#
+#   python scripts/build_site.py --explain
+
+BASE_URL = "https://aisuomi.blog"
+INDEX_FILE = ROOT / "index.html"
+STYLES_FILE = ROOT / "assets" / "styles.css"
+
+
+# ---------------------------------------------------------------------------
+# index.html: last-modified ja tyylitiedoston versio
+# ---------------------------------------------------------------------------
+
+_META_RE = re.compile(r'<meta\s+name="last-modified"[^>]*>', re.IGNORECASE)
+_VIEWPORT_RE = re.compile(r'(<meta[^>]+name="viewport"[^>]*>\s*)', re.IGNORECASE)
+_HEAD_END_RE = re.compile(r'</head>', re.IGNORECASE)
+_STYLES_HREF_RE = re.compile(r'href="/assets/styles\.css[^"]*"')
+
+
+def patch_index_meta(html_text: str, iso_date: str, version: str) -> str:
+    meta_tag = f'<meta name="last-modified" content="{iso_date}" />'
+    if _META_RE.search(html_text):
+        html_text = _META_RE.sub(meta_tag, html_text, count=1)
+    else:
+        # Jos last-modified puuttuu, lisätään se viewport-metatagin jälkeen,
+        # varatapana ennen </head>-tagia tai aivan alkuun.
+        m = _VIEWPORT_RE.search(html_text) or _HEAD_END_RE.search(html_text)
+        if m:
+            pos = m.end() if m.re is _VIEWPORT_RE else m.start()
+            html_text = html_text[:pos] + "  " + meta_tag + "\n" + html_text[pos:]
+        else:
+            html_text = meta_tag + "\n" + html_text
+
+    html_text, count = _STYLES_HREF_RE.subn(f'href="/assets/styles.css?v={version}"', html_text, count=1)
+    if count == 0:
+        print("VAROITUS: styles.css -viittausta ei löytynyt index.html:stä.")
+    return html_text
+
+
+# ---------------------------------------------------------------------------
+# Koonti
+# ---------------------------------------------------------------------------
+
+def build_site(graph: BuildGraph) -> None:
+    recipe_source = {"scripts/build_site.py": graph.file(Path(__file__))}
+
+    graph.build(
+        "artikkelisivut",
+        lambda: graph.files(post_template_sources() + [ROOT / "scripts" / "site_template.py"]),
+        rerender_site,
+    )
+    # Uudelleenrenderöinti päivittää tiedostoja ja manifestia, joten manifesti luetaan vasta nyt.
+    manifest = PostManifest.load()
+    manifest.save()
+
+    import generate_news  # uutissivut; tuodaan vasta tarvittaessa
+
+    conn = generate_news.open_history_store()
+    try:
+        generate_news.update_index_page(conn, graph)
+    finally:
+        conn.close()
+
+    feeds.build_feeds(graph, manifest)
+
+    # Etusivun lista ja sen meta (last-modified, tyylitiedoston versio) samassa
+    # kohteessa, jotta index.html:ää kirjoittaa vain yksi kohde.
+    def patch_index(html_text: str) -> str:
+        today = datetime.utcnow().date().isoformat()
+        version = graph.file(STYLES_FILE)[:8]
+        print(f"index.html päivitetty: last-modified={today}, css-versio=v{version}")
+        return patch_index_meta(html_text, today, version)
+
+    index_pages.build_index(graph, manifest, "etusivu",
+                            extra_inputs=lambda: {**graph.files([STYLES_FILE]), **recipe_source},
+                            after_patch=patch_index)
+    for name in ("talous", "ruoka", "yhteiskunta", "teema"):
+        index_pages.build_index(graph, manifest, name)
+
+    sitemap.build_sitemap(graph, manifest)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Kokoa muuttuneet sivut, syötteet ja sivukartta.")
+    parser.add_argument("--explain", action="store_true", help="näytä, miksi kukin kohde koottiin")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    graph = BuildGraph(STATE_PATH, ROOT, explain=args.explain)
+    try:
+        build_site(graph)
+    finally:
+        graph.save()
+    print(graph.summary(started))
+
+
+if __name__ == "__main__":
+    main()
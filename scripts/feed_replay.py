@@ -0,0 +1,240 @@
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+import argparse
+import hashlib
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+
+# Uutisputken offline-ajot: record tallentaa SOURCES-syötteiden raakavastaukset
+# otsakkeineen, serve jakaa ne paikallisesta HTTP-palvelimesta ja bench ajaa
+# collect_news/build_recent_html/update_index_page päästä päähän ilman verkkoa.
+# fixtures/feeds/ sisältää pienen valmiin aineiston (kolme lähdettä).
+#
+#   python scripts/feed_replay.py record
+#   python scripts/feed_replay.py serve --latency-ms 200 --error-rate 0.1
+#   NEWS_SOURCES_BASE_URL=http://127.0.0.1:8787 NEWS_STATE_DIR=/tmp/uutiset python scripts/generate_news.py
+#   python scripts/feed_replay.py bench --runs 3
+
+ROOT = Path(__file__).resolve().parents[1]
+FIXTURES_DIR = ROOT / "fixtures" / "feeds"
+
+# Otsakkeet, jotka tallennetaan ja toistetaan sellaisenaan.
+REPLAY_HEADERS = ("Content-Type", "Content-Encoding", "ETag", "Last-Modified")
+
+
+def source_slug(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+def redirect_sources(sources: list[dict], base_url: str) -> list[dict]:
+    """Ohjaa SOURCES-lähteet paikalliselle toistopalvelimelle."""
+    base_url = base_url.rstrip("/")
+    return [dict(src, url=f"{base_url}/{source_slug(src['url'])}") for src in sources]
+
+
+def prepare_state_dir(path: str | None, copy_files: list[Path]) -> Path:
+    """Erillinen tilahakemisto toistoajolle (NEWS_STATE_DIR tai uusi väliaikaishakemisto).
+
+    copy_files (uutissivu, vanha JSON-historia) kopioidaan sinne, jos niitä ei vielä ole.
+    """
+    state = Path(path).resolve() if path else Path(tempfile.mkdtemp(prefix="news-replay-"))
+    if state in (ROOT, ROOT / "data"):
+        raise SystemExit("NEWS_STATE_DIR ei voi olla repon juuri tai data/: toistoajo kirjoittaisi tuotannon tilan yli.")
+    state.mkdir(parents=True, exist_ok=True)
+    for src in copy_files:
+        if src.exists() and not (state / src.name).exists():
+            shutil.copy(src, state / src.name)
+    return state
+
+
+def record(sources: list[dict], fixtures_dir: Path, timeout: float) -> None:
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    for src in sources:
+        slug = source_slug(src["url"])
+        try:
+            with urlopen(Request(src["url"], headers={"Accept-Encoding": "gzip"}), timeout=timeout) as resp:
+                status = resp.status
+                headers = resp.headers
+                body = resp.read()
+        except HTTPError as e:
+            status, headers, body = e.code, e.headers, e.read()
+        except (URLError, TimeoutError, OSError) as e:
+            print(f"VAROITUS: '{src['name']}' ei tallennettu: {e}")
+            continue
+
+        (fixtures_dir / f"{slug}.body").write_bytes(body)
+        meta = {
+            "name": src["name"],
+            "url": src["url"],
+            "status": status,
+            "headers": {h: headers[h] for h in REPLAY_HEADERS if headers.get(h)},
+        }
+        (fixtures_dir / f"{slug}.json").write_text(
+            json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"Tallennettiin {src['name']}: {status}, {len(body)} tavua")
+
+
+def make_handler(fixtures_dir: Path, latency_ms: float, error_rate: float,
+                 not_modified: bool, oversize_bytes: int, rng: random.Random):
+    lock = threading.Lock()
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler API
+            pass
+
+        def do_GET(self):
+            slug = self.path.strip("/").split("?", 1)[0]
+            meta_path = fixtures_dir / f"{slug}.json"
+            if not slug or not meta_path.exists():
+                self.send_error(404)
+                return
+
+            with lock:
+                fail = rng.random() < error_rate
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            if fail:
+                self.send_error(503)
+                return
+
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            headers = meta.get("headers", {})
+            if not_modified and (
+                (headers.get("ETag") and self.headers.get("If-None-Match") == headers["ETag"])
+                or (headers.get("Last-Modified") and self.headers.get("If-Modified-Since"))
+            ):
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            body = (fixtures_dir / f"{slug}.body").read_bytes()
+            if oversize_bytes and not headers.get("Content-Encoding"):
+                # Täyte XML-kommenttina ennen ensimmäistä kohdetta.
+                pad = b"<!--" + b"x" * oversize_bytes + b"-->"
+                cut = body.find(b"?>")
+                cut = cut + 2 if cut != -1 else 0
+                body = body[:cut] + pad + body[cut:]
+
+            self.send_response(meta.get("status", 200))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return ReplayHandler
+
+
+def start_server(fixtures_dir: Path, host: str = "127.0.0.1", port: int = 0,
+                 latency_ms: float = 0, error_rate: float = 0.0, not_modified: bool = False,
+                 oversize_bytes: int = 0, seed: int = 1) -> ThreadingHTTPServer:
+    handler = make_handler(fixtures_dir, latency_ms, error_rate, not_modified, oversize_bytes, random.Random(seed))
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench(args) -> None:
+    import generate_news
+
+    server = start_server(
+        args.dir,
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        not_modified=args.not_modified,
+        oversize_bytes=args.oversize_bytes,
+    )
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    work = Path(tempfile.mkdtemp(prefix="news-bench-"))
+    try:
+        # Kaikki tila ja tulosteet väliaikaishakemistoon, jotta repo ei muutu.
+        shutil.copy(generate_news.NEWS_INDEX_PAGE, work / generate_news.NEWS_INDEX_PAGE.name)
+        if generate_news.NEWS_HISTORY_PATH.exists() and not args.empty_history:
+            shutil.copy(generate_news.NEWS_HISTORY_PATH, work / generate_news.NEWS_HISTORY_PATH.name)
+        generate_news.ROOT = work
+        generate_news.NEWS_INDEX_PAGE = work / generate_news.NEWS_INDEX_PAGE.name
+        generate_news.NEWS_HISTORY_PATH = work / generate_news.NEWS_HISTORY_PATH.name
+        generate_news.NEWS_DB_PATH = work / "news_history.sqlite3"
+        generate_news.FETCH_CACHE_PATH = work / "fetch_cache.json"
+        generate_news.SOURCE_STATS_PATH = work / "source_stats.json"
+        generate_news.BUILD_STATE_PATH = work / "build_state.json"
+        generate_news.POLL_ALL = True
+        generate_news.SOURCES = redirect_sources(generate_news.SOURCES, base_url)
+
+        conn = generate_news.open_history_store()
+        for run in range(1, args.runs + 1):
+            t0 = time.perf_counter()
+            new_items = generate_news.collect_news(conn)
+            t1 = time.perf_counter()
+            cutoff = (datetime.utcnow().date() - timedelta(days=7)).isoformat()
+            generate_news.build_recent_html(generate_news.news_store.items_since(conn, cutoff))
+            t2 = time.perf_counter()
+            generate_news.update_index_page(conn)
+            t3 = time.perf_counter()
+            print(
+                f"BENCH ajo {run}: collect_news {t1 - t0:.3f} s ({len(new_items)} uutta), "
+                f"build_recent_html {t2 - t1:.3f} s, update_index_page {t3 - t2:.3f} s",
+                file=sys.stderr,
+            )
+        conn.close()
+    finally:
+        server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Uutissyötteiden tallennus ja toisto.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_record = sub.add_parser("record", help="tallenna SOURCES-syötteet fixtureiksi")
+    p_record.add_argument("--timeout", type=float, default=15)
+
+    for name in ("serve", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--latency-ms", type=float, default=0, help="viive jokaiseen vastaukseen")
+        p.add_argument("--error-rate", type=float, default=0.0, help="osuus pyynnöistä, joihin vastataan 503")
+        p.add_argument("--not-modified", action="store_true", help="vastaa 304, jos pyynnössä on validaattori")
+        p.add_argument("--oversize-bytes", type=int, default=0, help="lisää vastaukseen näin monta tavua täytettä")
+    sub.choices["serve"].add_argument("--host", default="127.0.0.1")
+    sub.choices["serve"].add_argument("--port", type=int, default=8787)
+    sub.choices["bench"].add_argument("--runs", type=int, default=3)
+    sub.choices["bench"].add_argument("--empty-history", action="store_true", help="aloita tyhjästä historiasta")
+
+    for p in sub.choices.values():
+        p.add_argument("--dir", type=Path, default=FIXTURES_DIR, help="fixture-hakemisto")
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        import generate_news
+
+        record(generate_news.SOURCES, args.dir, args.timeout)
+    elif args.command == "serve":
+        server = start_server(
+            args.dir, args.host, args.port, args.latency_ms, args.error_rate,
+            args.not_modified, args.oversize_bytes,
+        )
+        print(f"Toistopalvelin: http://{args.host}:{server.server_address[1]} "
+              f"(NEWS_SOURCES_BASE_URL tähän osoitteeseen)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    main()
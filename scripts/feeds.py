@@ -0,0 +1,189 @@
+from datetime import datetime
+from pathlib import Path
+import html
+import json
+
+from build_graph import BuildGraph, fingerprint, write_if_changed
+from post_manifest import ROOT, PostManifest
+
+
+# Artikkelisyötteet: koko sivuston ja jokaisen kategorian RSS 2.0, Atom ja
+# JSON Feed. Syötteen ikkuna (uusimmat FEED_ITEMS juttua) ja kuvaukset tulevat
+# manifestin metatiedoista, joten artikkelitiedostoja ei lueta. Syöte on
+# BuildGraphin kohde, jonka syötteinä ovat ikkunan juttujen päivä, otsikko ja
+# tiivistelmä; tiedosto kirjoitetaan vain, jos sen tavut muuttuvat. Syötteen
+# aikaleima on uusimman jutun päivä eikä koonnin kellonaika.
+#
+#   /rss.xml, /feeds/kaikki.atom, /feeds/kaikki.json
+#   /feeds/talous.xml, /feeds/talous.atom, /feeds/talous.json ...
+#
+# index.html ja kategoriasivut mainostavat syötteensä <link rel="alternate"> -tageilla.
+
+BASE_URL = "https://aisuomi.blog"
+FEEDS_DIR = ROOT / "feeds"
+RSS_FILE = ROOT / "rss.xml"
+
+FEED_ITEMS = 20
+SITE_FEED_ITEMS = 50
+
+SITE_TITLE = "AISuomi – autonominen suomalainen AI-media"
+SITE_DESCRIPTION = ("Autonomisesti tekoälyn tuottamia suomenkielisiä artikkeleita Suomen arjesta, "
+                    "taloudesta ja yhteiskunnasta.")
+
+# nimi: (kategoriat, otsikko, kotisivu, juttujen määrä)
+FEEDS = {
+    "kaikki": (("talous", "ruoka", "yhteiskunta", "teema"), SITE_TITLE, "/", SITE_FEED_ITEMS),
+    "talous": (("talous",), "AISuomi – Talous", "/talous.html", FEED_ITEMS),
+    "ruoka": (("ruoka",), "AISuomi – Ruoka", "/ruoka.html", FEED_ITEMS),
+    "yhteiskunta": (("yhteiskunta",), "AISuomi – Yhteiskunta", "/yhteiskunta.html", FEED_ITEMS),
+    "teema": (("teema",), "AISuomi – Teema", "/teema.html", FEED_ITEMS),
+}
+
+
+def feed_paths(name: str) -> dict[str, Path]:
+    """{muoto: tiedosto}; koko sivuston RSS pysyy vanhassa osoitteessa /rss.xml."""
+    return {
+        "rss": RSS_FILE if name == "kaikki" else FEEDS_DIR / f"{name}.xml",
+        "atom": FEEDS_DIR / f"{name}.atom",
+        "json": FEEDS_DIR / f"{name}.json",
+    }
+
+
+def feed_url(path: Path, base_url: str = BASE_URL) -> str:
+    return f"{base_url}/{path.relative_to(ROOT).as_posix()}"
+
+
+def feed_items(manifest: PostManifest, categories, limit: int) -> list[dict]:
+    """Ikkunan jutut uusin ensin: otsikko ja tiivistelmä pelkkänä tekstinä.
+
+    Manifestin rivit on jo lajiteltu, joten syötettä kohden käydään läpi vain
+    rivit ikkunan vanhimpaan juttuun asti.
+    """
+    return [
+        {
+            "key": key,
+            "date": entry["date"],
+            "category": entry["category"],
+            "title": html.unescape(entry["title"]),
+            "summary": entry.get("summary", ""),
+        }
+        for key, entry in manifest.posts(set(categories), limit=limit)
+    ]
+
+
+def _x(text: str) -> str:
+    return html.escape(text, quote=False)
+
+
+def _rfc822(iso_date: str) -> str:
+    return datetime.strptime(iso_date, "%Y-%m-%d").strftime("%a, %d %b %Y %H:%M:%S +0000")
+
+
+def render_rss(title: str, home: str, self_url: str, items: list[dict], base_url: str = BASE_URL) -> str:
+    entries = []
+    for item in items:
+        link = f"{base_url}/{item['key']}"
+        entries.append(f"""    <item>
+      <title>{_x(item['title'])}</title>
+      <link>{link}</link>
+      <guid>{link}</guid>
+      <pubDate>{_rfc822(item['date'])}</pubDate>
+      <category>{item['category']}</category>
+      <description>{_x(item['summary'])}</description>
+    </item>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">
+  <channel>
+    <title>{_x(title)}</title>
+    <link>{base_url}{home}</link>
+    <atom:link href="{self_url}" rel="self" type="application/rss+xml" />
+    <description>{_x(SITE_DESCRIPTION)}</description>
+    <language>fi</language>
+    <lastBuildDate>{_rfc822(items[0]['date'])}</lastBuildDate>
+{chr(10).join(entries)}
+  </channel>
+</rss>
+"""
+
+
+def render_atom(title: str, home: str, self_url: str, items: list[dict], base_url: str = BASE_URL) -> str:
+    entries = []
+    for item in items:
+        link = f"{base_url}/{item['key']}"
+        entries.append(f"""  <entry>
+    <title>{_x(item['title'])}</title>
+    <link href="{link}" />
+    <id>{link}</id>
+    <updated>{item['date']}T00:00:00Z</updated>
+    <category term="{item['category']}" />
+    <summary>{_x(item['summary'])}</summary>
+  </entry>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="fi">
+  <title>{_x(title)}</title>
+  <subtitle>{_x(SITE_DESCRIPTION)}</subtitle>
+  <link href="{base_url}{home}" />
+  <link href="{self_url}" rel="self" />
+  <id>{self_url}</id>
+  <updated>{items[0]['date']}T00:00:00Z</updated>
+  <author><name>AISuomi</name></author>
+{chr(10).join(entries)}
+</feed>
+"""
+
+
+def render_json_feed(title: str, home: str, self_url: str, items: list[dict], base_url: str = BASE_URL) -> str:
+    feed = {
+        "version": "https://jsonfeed.org/version/1.1",
+        "title": title,
+        "home_page_url": f"{base_url}{home}",
+        "feed_url": self_url,
+        "description": SITE_DESCRIPTION,
+        "language": "fi",
+        "items": [
+            {
+                "id": f"{base_url}/{item['key']}",
+                "url": f"{base_url}/{item['key']}",
+                "title": item["title"],
+                "content_text": item["summary"],
+                "summary": item["summary"],
+                "date_published": f"{item['date']}T00:00:00Z",
+                "tags": [item["category"]],
+            }
+            for item in items
+        ],
+    }
+    return json.dumps(feed, ensure_ascii=False, indent=1) + "\n"
+
+
+RENDERERS = {"rss": render_rss, "atom": render_atom, "json": render_json_feed}
+
+
+def build_feeds(graph: BuildGraph, manifest: PostManifest) -> None:
+    """Jokainen syöte (kolme tiedostoa) on yksi graafin kohde."""
+    recipe = {"scripts/feeds.py": graph.file(Path(__file__))}
+    for name, (categories, title, home, limit) in FEEDS.items():
+        items = feed_items(manifest, categories, limit)
+        if not items:
+            continue
+        paths = feed_paths(name)
+
+        def write(paths=paths, title=title, home=home, items=items) -> None:
+            written = [
+                graph.key(path)
+                for fmt, path in paths.items()
+                if write_if_changed(path, RENDERERS[fmt](title, home, feed_url(path), items))
+            ]
+            if written:
+                print(f"Syötteet päivitetty: {', '.join(written)}")
+
+        graph.build(
+            f"syöte {name}",
+            lambda items=items: {
+                **{item["key"]: fingerprint(f"{item['date']}\n{item['title']}\n{item['summary']}")
+                   for item in items},
+                **recipe,
+            },
+            write,
+            outputs=list(paths.values()),
+        )
@@ -1,19 +1,45 @@
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import os
 import json
+import hashlib
 import html
-from urllib.request import urlopen
+import re
+import threading
+import unicodedata
+import time
+import zlib
+import xml.etree.ElementTree as ET
+import argparse
+from urllib.request import Request, urlopen
 from urllib.error import URLError, HTTPError
 
 import feedparser  # asennettu workflowissa
 
+from build_graph import BuildGraph, fingerprint, write_if_changed
+import news_dedupe
+import news_store
+import source_stats
+
+try:
+    import brotli  # valinnainen, br-pakkaus vain jos kirjasto on asennettu
+except ImportError:
+    brotli = None
+
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
 NEWS_HISTORY_PATH = DATA_DIR / "news_history.json"
+NEWS_DB_PATH = DATA_DIR / "news_history.sqlite3"
+FETCH_CACHE_PATH = DATA_DIR / "fetch_cache.json"
+SOURCE_STATS_PATH = DATA_DIR / "source_stats.json"
 NEWS_INDEX_PAGE = ROOT / "uutisiasuomesta.html"
+BUILD_STATE_PATH = DATA_DIR / "build_state.json"
 
 # Kuinka kauan maksimissaan odotetaan yksittäistä RSS-lähdettä (sekunteina)
 REQUEST_TIMEOUT = 8
@@ -22,6 +48,24 @@ REQUEST_TIMEOUT = 8
 # Jos haluat käsitellä kaikki, voit käyttää esim. None ja poistaa viipaleen.
 MAX_ENTRIES_PER_FEED = 100
 
+# Rinnakkainen haku: montako lähdettä haetaan yhtä aikaa, montako pyyntöä
+# samaan palvelimeen saa olla käynnissä ja kuinka kauan koko hakuvaihe saa
+# kestää (sekunteina). NEWS_FETCH_WORKERS=1 palauttaa vanhan peräkkäisen haun.
+FETCH_WORKERS = int(os.environ.get("NEWS_FETCH_WORKERS", "8"))
+FETCH_PER_HOST = int(os.environ.get("NEWS_FETCH_PER_HOST", "2"))
+FETCH_DEADLINE = float(os.environ.get("NEWS_FETCH_DEADLINE", "120"))
+
+# Tuottoon perustuva hakuaikataulu (source_stats.schedule_sources): montako
+# lähdettä yhdellä ajolla korkeintaan haetaan ja kuinka vanhaksi minkään lähteen
+# viimeisin haku saa päästä. NEWS_POLL_ALL=1 hakee kaikki lähteet joka kerta.
+POLL_BUDGET = int(os.environ.get("NEWS_POLL_BUDGET", "24"))
+MAX_STALENESS = timedelta(hours=float(os.environ.get("NEWS_MAX_STALENESS_HOURS", "72")))
+POLL_ALL = os.environ.get("NEWS_POLL_ALL") == "1"
+
+# Kuinka monta päivää uutisia säilytetään tietokannassa. Tyhjä = kaikki
+# (vuosiarkistot tarvitsevat vanhatkin rivit).
+RETENTION_DAYS = int(os.environ["NEWS_RETENTION_DAYS"]) if os.environ.get("NEWS_RETENTION_DAYS") else None
+
 # ---------------------------------------------------------------------------
 # Lähdelista: ulkomaiset uutismediat, jotka voivat mainita Suomen
 # ---------------------------------------------------------------------------
@@ -229,6 +273,25 @@ SOURCES = [
     },
 ]
 
+# Offline-ajoissa lähteet ohjataan paikalliselle toistopalvelimelle
+# (scripts/feed_replay.py serve). Tila (kanta, ETagit, lähdetilastot, koontitila)
+# ja uutissivut kirjoitetaan silloin NEWS_STATE_DIR-hakemistoon tai uuteen
+# väliaikaishakemistoon, jotta toistettu data ei päädy tuotannon tiedostoihin.
+if os.environ.get("NEWS_SOURCES_BASE_URL"):
+    import feed_replay
+
+    SOURCES = feed_replay.redirect_sources(SOURCES, os.environ["NEWS_SOURCES_BASE_URL"])
+    ROOT = DATA_DIR = feed_replay.prepare_state_dir(
+        os.environ.get("NEWS_STATE_DIR"), [NEWS_INDEX_PAGE, NEWS_HISTORY_PATH]
+    )
+    NEWS_HISTORY_PATH = DATA_DIR / NEWS_HISTORY_PATH.name
+    NEWS_DB_PATH = DATA_DIR / NEWS_DB_PATH.name
+    FETCH_CACHE_PATH = DATA_DIR / FETCH_CACHE_PATH.name
+    SOURCE_STATS_PATH = DATA_DIR / SOURCE_STATS_PATH.name
+    BUILD_STATE_PATH = DATA_DIR / BUILD_STATE_PATH.name
+    NEWS_INDEX_PAGE = ROOT / NEWS_INDEX_PAGE.name
+    print(f"Toistoajo: tila ja uutissivut hakemistossa {ROOT}")
+
 # ---------------------------------------------------------------------------
 # Hakusanat
 # ---------------------------------------------------------------------------
@@ -259,13 +322,56 @@ KEYWORDS_LOCAL = [
 
 ALL_KEYWORDS = KEYWORDS_COUNTRY + KEYWORDS_LOCAL
 
+KEYWORD_GROUPS = {
+    "country": KEYWORDS_COUNTRY,
+    "local": KEYWORDS_LOCAL,
+}
+
+
+def normalize_for_match(text: str) -> str:
+    """Casefold + diakriittien poisto, jotta "FINLÂNDIA" ja "finlândia" täsmäävät."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def compile_keyword_matcher(groups: dict[str, list[str]]):
+    """Kokoa kaikista hakusanoista yksi säännöllinen lauseke.
+
+    Lookahead-vaihtoehtoja käytetään, jotta päällekkäisetkin osumat löytyvät
+    yhdellä läpikäynnillä. Palauttaa (pattern, {normalisoitu sana: ryhmä}).
+    """
+    keyword_group: dict[str, str] = {}
+    for group, keywords in groups.items():
+        for kw in keywords:
+            keyword_group.setdefault(normalize_for_match(kw), group)
+    alternation = "|".join(
+        re.escape(kw) for kw in sorted(keyword_group, key=len, reverse=True)
+    )
+    return re.compile(f"(?=({alternation}))"), keyword_group
+
+
+KEYWORD_PATTERN, KEYWORD_TO_GROUP = compile_keyword_matcher(KEYWORD_GROUPS)
+
+
+def match_keyword_groups(text: str) -> list[str]:
+    """Palauta ne KEYWORD_GROUPS-ryhmät, joiden hakusanoja tekstissä esiintyy."""
+    found: set[str] = set()
+    for m in KEYWORD_PATTERN.finditer(normalize_for_match(text)):
+        found.add(KEYWORD_TO_GROUP[m.group(1)])
+        if len(found) == len(KEYWORD_GROUPS):
+            break
+    return [group for group in KEYWORD_GROUPS if group in found]
+
 
 # ---------------------------------------------------------------------------
 # Historia-tiedosto
 # ---------------------------------------------------------------------------
 
 def load_history() -> dict:
-    """Lataa news_history.json ja normalisoi muotoon {'items': [...]}."""
+    """Lataa news_history.json ja normalisoi muotoon {'items': [...]}.
+
+    JSON on versionhallinnassa säilyvä historia; SQLite-kanta rakennetaan siitä.
+    """
     if not NEWS_HISTORY_PATH.exists():
         return {"items": []}
 
@@ -284,12 +390,52 @@ def load_history() -> dict:
     items = data.get("items")
     if not isinstance(items, list):
         data["items"] = []
+        return data
+
+    # Vanhoille riveille lasketaan osumaryhmät kerran, jotta renderöinnin
+    # ei tarvitse käydä tekstejä läpi.
+    for item in data["items"]:
+        if isinstance(item, dict) and "matches" not in item:
+            stored_text = item.get("text")
+            if not (isinstance(stored_text, str) and stored_text):
+                stored_text = f"{item.get('title', '')} {item.get('source', '')}".lower()
+            item["matches"] = match_keyword_groups(stored_text)
     return data
 
 
-def save_history(history: dict) -> None:
-    with NEWS_HISTORY_PATH.open("w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+def save_history(history: dict) -> bool:
+    """Kirjoita news_history.json vain, jos sisältö muuttui. Palauttaa True, jos kirjoitettiin."""
+    return write_if_changed(NEWS_HISTORY_PATH, json.dumps(history, ensure_ascii=False, indent=2) + "\n")
+
+
+def open_history_store():
+    """Avaa uutistietokanta. Tyhjä kanta rakennetaan news_history.jsonista.
+
+    Kanta (data/*.sqlite3) ei ole versionhallinnassa: workflow aloittaa aina
+    tyhjästä, ja ajon lopuksi historia kirjoitetaan takaisin JSONiin.
+    """
+    conn = news_store.open_store(NEWS_DB_PATH)
+    if news_store.count_items(conn) == 0 and NEWS_HISTORY_PATH.exists():
+        added = news_store.import_history(conn, load_history())
+        print(f"Tuotiin {added} uutista tiedostosta {NEWS_HISTORY_PATH.name} tietokantaan.")
+    return conn
+
+
+def load_fetch_cache() -> dict:
+    """Lataa lähdekohtaiset ETag/Last-Modified-tiedot muodossa {url: {...}}."""
+    if not FETCH_CACHE_PATH.exists():
+        return {}
+    try:
+        with FETCH_CACHE_PATH.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_fetch_cache(cache: dict) -> None:
+    with FETCH_CACHE_PATH.open("w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2, sort_keys=True)
 
 
 def iso_date_from_entry(entry) -> str:
@@ -308,56 +454,403 @@ def iso_date_from_entry(entry) -> str:
 # Uutisten keruu (timeout + max entries)
 # ---------------------------------------------------------------------------
 
-def collect_news() -> dict:
-    history = load_history()
+ACCEPT_ENCODING = "gzip, br" if brotli is not None else "gzip"
 
-    known_links = {
-        item.get("link")
-        for item in history["items"]
-        if isinstance(item, dict) and item.get("link")
+
+# Yhdestä syötteestä luetaan korkeintaan tämän verran (purettuja) tavuja.
+MAX_FEED_BYTES = 4 * 1024 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+ENTRY_TAGS = {"item", "entry"}
+SUMMARY_TAGS = ("description", "summary", "encoded", "content")
+DATE_TAGS = ("pubDate", "published", "updated", "date", "issued", "modified")
+
+
+def _deflate_decoder():
+    """deflate on yleensä zlib-kääreinen, mutta osa palvelimista lähettää raakaa deflatea."""
+    state = {"decoder": zlib.decompressobj(), "first": True}
+
+    def decode(data: bytes) -> bytes:
+        if state["first"] and data:
+            state["first"] = False
+            try:
+                return state["decoder"].decompress(data)
+            except zlib.error:
+                state["decoder"] = zlib.decompressobj(-zlib.MAX_WBITS)
+        return state["decoder"].decompress(data)
+
+    return decode
+
+
+def stream_decoder(encoding: str):
+    """Palauta funktio, joka purkaa gzip/deflate/br-pakattua vastausta paloittain."""
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+    if encoding == "deflate":
+        return _deflate_decoder()
+    if encoding == "br" and brotli is not None:
+        return brotli.Decompressor().process
+    return lambda data: data
+
+
+def empty_fetch_result(error: str | None = None, cached: dict | None = None, attempted: bool = True) -> dict:
+    """Haun tulos ilman syötettä. attempted=False: pyyntöä ei ehditty lähettää
+    (hakuvaiheen aikaraja), joten tulosta ei lasketa lähteen virheeksi."""
+    return {
+        "attempted": attempted,
+        "entries": None,
+        "error": error,
+        "bozo": None,
+        "truncated": False,
+        "not_modified": False,
+        "cache": cached,
+        "wire_bytes": 0,
+        "body_bytes": 0,
+        "status": None,
+        "elapsed": None,
     }
 
+
+def _local_name(tag) -> str:
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+
+def iso_date_from_text(value: str) -> str | None:
+    """Tulkitse RFC 822- (RSS) tai ISO 8601 -aika (Atom) UTC-päiväksi."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.date().isoformat()
+
+
+def entry_from_element(elem) -> dict:
+    """Poimi RSS <item>- tai Atom <entry> -elementistä vain tarvittavat kentät."""
+    fields: dict[str, str] = {}
+    for child in elem:
+        name = _local_name(child.tag)
+        text = "".join(child.itertext()).strip()
+        if name == "link":
+            href = child.get("href")
+            if href:
+                if child.get("rel", "alternate") == "alternate":
+                    fields.setdefault("link", href.strip())
+            elif text:
+                fields.setdefault("link", text)
+        elif name == "title":
+            fields.setdefault("title", text)
+        elif name in SUMMARY_TAGS and text:
+            fields.setdefault(f"summary_{name}", text)
+        elif name in DATE_TAGS and text:
+            fields.setdefault(f"date_{name}", text)
+
+    summary = next((fields[f"summary_{t}"] for t in SUMMARY_TAGS if f"summary_{t}" in fields), "")
+    published = None
+    for t in DATE_TAGS:
+        if f"date_{t}" in fields:
+            published = iso_date_from_text(fields[f"date_{t}"])
+            if published:
+                break
+
+    return {
+        "title": fields.get("title", ""),
+        "link": fields.get("link", ""),
+        "summary": summary,
+        "published": published,
+    }
+
+
+def entries_from_feedparser(feed) -> list[dict]:
+    entries = feed.entries
+    if MAX_ENTRIES_PER_FEED is not None:
+        entries = entries[:MAX_ENTRIES_PER_FEED]
+    return [
+        {
+            "title": getattr(entry, "title", ""),
+            "link": getattr(entry, "link", ""),
+            "summary": getattr(entry, "summary", ""),
+            "published": iso_date_from_entry(entry),
+        }
+        for entry in entries
+    ]
+
+
+def _read_chunk(resp, deadline: float | None) -> bytes:
+    """Seuraava pala vastauksesta; TimeoutError, jos hakuvaiheen aikaraja on jo mennyt.
+
+    read1 palauttaa sen, mitä on saatavilla, joten hitaasti tippuva vastaus ei
+    pidä yhtä lukua auki pidempään kuin socketin aikakatkaisu.
+    """
+    if deadline is not None and time.monotonic() >= deadline:
+        raise TimeoutError("hakuvaiheen aikaraja ylittyi kesken luvun")
+    return resp.read1(READ_CHUNK_BYTES)
+
+
+def parse_feed_stream(resp, result: dict, deadline: float | None = None) -> None:
+    """Lue vastausta paloittain ja jäsennä kohteet XMLPullParserilla.
+
+    Luku lopetetaan heti, kun MAX_ENTRIES_PER_FEED kohdetta on saatu tai
+    MAX_FEED_BYTES ylittyy. Virheellinen XML (esim. HTML-entiteetit) jäsennetään
+    feedparserilla, joka sietää rikkinäisiä syötteitä. deadline (time.monotonic)
+    tarkistetaan ennen jokaista lukua.
+    """
+    decode = stream_decoder(resp.headers.get("Content-Encoding", ""))
+    parser = ET.XMLPullParser(events=("end",))
+    chunks: list[bytes] = []
+    entries: list[dict] = []
+    limit = MAX_ENTRIES_PER_FEED
+
+    while True:
+        raw = _read_chunk(resp, deadline)
+        if not raw:
+            break
+        result["wire_bytes"] += len(raw)
+        data = decode(raw)
+        result["body_bytes"] += len(data)
+        chunks.append(data)
+        if result["body_bytes"] > MAX_FEED_BYTES:
+            result["truncated"] = True
+
+        try:
+            parser.feed(data)
+            for _, elem in parser.read_events():
+                if _local_name(elem.tag) not in ENTRY_TAGS:
+                    continue
+                entries.append(entry_from_element(elem))
+                elem.clear()
+                if limit is not None and len(entries) >= limit:
+                    break
+        except ET.ParseError as e:
+            result["bozo"] = e
+            break
+
+        if result["truncated"] or (limit is not None and len(entries) >= limit):
+            result["entries"] = entries
+            return
+
+    if result["bozo"] is None:
+        result["entries"] = entries
+        return
+
+    # Rikkinäinen syöte: luetaan loput (katon puitteissa) ja annetaan feedparserin yrittää.
+    while result["body_bytes"] <= MAX_FEED_BYTES:
+        raw = _read_chunk(resp, deadline)
+        if not raw:
+            break
+        result["wire_bytes"] += len(raw)
+        data = decode(raw)
+        result["body_bytes"] += len(data)
+        chunks.append(data)
+    feed = feedparser.parse(b"".join(chunks))
+    result["entries"] = entries_from_feedparser(feed)
+
+
+def fetch_feed(src: dict, timeout: float = REQUEST_TIMEOUT, cached: dict | None = None,
+               deadline: float | None = None) -> dict:
+    """Hae ja jäsennä yksi lähde ehdollisella GET-pyynnöllä.
+
+    Palauttaa empty_fetch_result()-muotoisen sanakirjan. Jos palvelin vastaa
+    304, syötettä ei jäsennetä lainkaan. Kun deadline (time.monotonic) menee
+    ohi, luku katkaistaan seuraavan palan kohdalla.
+    """
+    result = empty_fetch_result(cached=cached)
+    headers = {"Accept-Encoding": ACCEPT_ENCODING}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    started = time.monotonic()
+    try:
+        # Ajallinen turvaraja yhdelle lähteelle
+        with urlopen(Request(src["url"], headers=headers), timeout=timeout) as resp:
+            result["status"] = resp.status
+            parse_feed_stream(resp, result, deadline)
+            resp_headers = resp.headers
+    except HTTPError as e:
+        result["status"] = e.code
+        result["elapsed"] = time.monotonic() - started
+        if e.code == 304:
+            result["not_modified"] = True
+            return result
+        result["error"] = f"haku epäonnistui (verkko/timeout): {e}"
+        return result
+    except (URLError, TimeoutError) as e:
+        result["elapsed"] = time.monotonic() - started
+        result["error"] = f"haku epäonnistui (verkko/timeout): {e}"
+        return result
+    except Exception as e:
+        result["elapsed"] = time.monotonic() - started
+        result["error"] = f"haku epäonnistui: {e}"
+        return result
+    result["elapsed"] = time.monotonic() - started
+
+    result["cache"] = {
+        "etag": resp_headers.get("ETag"),
+        "last_modified": resp_headers.get("Last-Modified"),
+        "body_bytes": result["body_bytes"],
+    }
+    return result
+
+
+def fetch_all(sources: list[dict], cache: dict | None = None) -> list[dict]:
+    """Hae lähteet rinnakkain. Tulokset palautetaan samassa järjestyksessä kuin sources.
+
+    Samaan palvelimeen tehdään korkeintaan FETCH_PER_HOST pyyntöä kerrallaan.
+    Funktio palaa FETCH_DEADLINE sekunnin kuluttua. Kesken olevat haut eivät
+    aloita aikarajan jälkeen uutta lukua, joten niiden säikeet päättyvät
+    viimeistään yhden lukukerran (REQUEST_TIMEOUT) päästä; prosessin lopetus
+    odottaa siis enintään FETCH_DEADLINE + REQUEST_TIMEOUT sekuntia.
+    """
+    deadline = time.monotonic() + FETCH_DEADLINE
+    host_locks: dict[str, threading.BoundedSemaphore] = {}
+    for src in sources:
+        host = urlparse(src["url"]).hostname or ""
+        host_locks.setdefault(host, threading.BoundedSemaphore(max(1, FETCH_PER_HOST)))
+
+    started: set[int] = set()
+
+    def run(i: int, src: dict) -> dict:
+        lock = host_locks[urlparse(src["url"]).hostname or ""]
+        with lock:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return empty_fetch_result("hakuvaiheen aikaraja ylittyi ennen hakua", attempted=False)
+            started.add(i)
+            return fetch_feed(
+                src,
+                timeout=min(REQUEST_TIMEOUT, remaining),
+                cached=(cache or {}).get(src["url"]),
+                deadline=deadline,
+            )
+
+    if FETCH_WORKERS <= 1:
+        return [run(i, src) for i, src in enumerate(sources)]
+
+    pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+    futures = [pool.submit(run, i, src) for i, src in enumerate(sources)]
+    wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    results: list[dict] = []
+    for i, fut in enumerate(futures):
+        if fut.done() and not fut.cancelled():
+            results.append(fut.result())
+        elif i in started:
+            results.append(empty_fetch_result("hakuvaiheen aikaraja ylittyi"))
+        else:
+            # Jonossa tai palvelinkohtaista vuoroa odottamassa: pyyntöä ei lähetetty.
+            results.append(empty_fetch_result("hakuvaiheen aikaraja ylittyi ennen hakua", attempted=False))
+    return results
+
+
+def collect_news(conn) -> list[dict]:
+    """Hae lähteet, tallenna uudet Suomi-aiheiset uutiset kantaan ja palauta ne."""
+    seen_links: set[str] = set()
     new_items: list[dict] = []
 
+    fetch_cache = load_fetch_cache()
+    stats = source_stats.load_stats(SOURCE_STATS_PATH)
+    now = datetime.now(timezone.utc)
+
+    # Katkaisija: toistuvasti epäonnistuneet lähteet ohitetaan, kunnes
+    # seuraavan koeyrityksen aika on käsillä.
+    active: list[dict] = []
     for src in SOURCES:
-        print(f"Haetaan uutisia lähteestä: {src['name']} ({src['url']})")
+        fetch, next_probe = source_stats.breaker_state(stats, src, now)
+        if fetch:
+            active.append(src)
+        else:
+            print(f"Ohitetaan lähde '{src['name']}' (toistuvia virheitä, seuraava yritys {next_probe}).")
 
-        try:
-            # Ajallinen turvaraja yhdelle lähteelle
-            with urlopen(src["url"], timeout=REQUEST_TIMEOUT) as resp:
-                data = resp.read()
-            feed = feedparser.parse(data)
-        except (URLError, HTTPError, TimeoutError) as e:
-            print(f"VAROITUS: Lähteen '{src['name']}' haku epäonnistui (verkko/timeout): {e}")
+    if not POLL_ALL:
+        active, deferred = source_stats.schedule_sources(stats, active, now, POLL_BUDGET, MAX_STALENESS)
+        print(f"Hakuaikataulu: {len(active)} lähdettä tällä ajolla, {deferred} lykätty vähäisen tuoton vuoksi.")
+
+    started = time.monotonic()
+    results = fetch_all(active, fetch_cache)
+    print(
+        f"Haettiin {len(active)}/{len(SOURCES)} lähdettä {time.monotonic() - started:.1f} sekunnissa "
+        f"({FETCH_WORKERS} rinnakkaista hakua)."
+    )
+
+    skipped = 0
+    bytes_saved = 0
+    for src, result in zip(active, results):
+        cached = fetch_cache.get(src["url"]) or {}
+        if result["not_modified"]:
+            skipped += 1
+            bytes_saved += int(cached.get("body_bytes") or 0)
+        elif result["entries"] is not None:
+            bytes_saved += result["body_bytes"] - result["wire_bytes"]
+            if result["cache"] and (result["cache"]["etag"] or result["cache"]["last_modified"]):
+                fetch_cache[src["url"]] = result["cache"]
+            else:
+                fetch_cache.pop(src["url"], None)
+    print(
+        f"Ehdollinen haku: {skipped} syötettä ennallaan (304), "
+        f"säästettiin noin {bytes_saved / 1024:.0f} kt siirtoa."
+    )
+
+    # Tulokset käsitellään aina SOURCES-järjestyksessä, joten lopputulos on
+    # sama kuin peräkkäisessä haussa.
+    for src, result in zip(active, results):
+        print(f"Käsitellään lähde: {src['name']} ({src['url']})")
+
+        if result["error"]:
+            print(f"VAROITUS: Lähteen '{src['name']}' {result['error']}")
+            # Lähettämätön pyyntö ei kerro lähteen kunnosta, joten katkaisija ei reagoi siihen.
+            if result["attempted"]:
+                source_stats.record_fetch(stats, src, result, now)
             continue
-        except Exception as e:
-            print(f"VAROITUS: Lähteen '{src['name']}' haku epäonnistui: {e}")
+
+        if result["not_modified"]:
+            print(f"Lähde '{src['name']}' ei ole muuttunut edellisen haun jälkeen, ohitetaan.")
+            source_stats.record_fetch(stats, src, result, now)
             continue
 
-        if getattr(feed, "bozo", 0):
+        if result["bozo"] is not None:
             print(
                 f"VAROITUS: Lähteen '{src['name']}' syöte voi olla ongelmallinen "
-                f"(bozo={feed.bozo}, exc={getattr(feed, 'bozo_exception', None)})"
+                f"(bozo=1, exc={result['bozo']})"
+            )
+        if result["truncated"]:
+            print(
+                f"VAROITUS: Lähteen '{src['name']}' syöte katkaistiin "
+                f"{MAX_FEED_BYTES // 1024} kt:n kohdalta."
             )
 
-        entries = feed.entries
-        if MAX_ENTRIES_PER_FEED is not None:
-            entries = entries[:MAX_ENTRIES_PER_FEED]
+        hits = 0
+        new_before = len(new_items)
 
-        for entry in entries:
-            title = getattr(entry, "title", "").strip()
-            link = getattr(entry, "link", "").strip()
-            summary = getattr(entry, "summary", "")
+        for entry in result["entries"]:
+            title = (entry["title"] or "").strip()
+            link = (entry["link"] or "").strip()
+            summary = entry["summary"] or ""
 
             if not title or not link:
                 continue
 
             text = f"{title} {summary}".lower()
 
-            if not any(kw in text for kw in ALL_KEYWORDS):
+            matches = match_keyword_groups(text)
+            if not matches:
                 continue
+            hits += 1
 
-            if link in known_links:
+            if link in seen_links or news_store.has_link(conn, link):
                 continue
 
             item = {
@@ -365,40 +858,50 @@ def collect_news() -> dict:
                 "link": link,
                 "source": src["name"],
                 "lang": src["lang"],
-                "published": iso_date_from_entry(entry),
+                "published": entry["published"] or datetime.utcnow().date().isoformat(),
                 "text": text,
+                "matches": matches,
             }
 
             new_items.append(item)
-            known_links.add(link)
-
-    if new_items:
-        history["items"].extend(new_items)
-        history["items"].sort(key=lambda x: x.get("published", ""), reverse=True)
-        history["items"] = history["items"][:2000]
+            seen_links.add(link)
+
+        source_stats.record_fetch(
+            stats,
+            src,
+            result,
+            now,
+            entries_seen=len(result["entries"]),
+            hits=hits,
+            new_items=len(new_items) - new_before,
+        )
 
-    return history
+    source_stats.save_stats(SOURCE_STATS_PATH, stats, now)
+    news_store.add_items(conn, new_items)
+    # Uudet ETag/Last-Modified-arvot vasta, kun syötteiden uutiset ovat kannassa:
+    # muuten keskeytynyt ajo saisi seuraavalla kerralla 304:n ja uutiset jäisivät pois.
+    save_fetch_cache(fetch_cache)
+    print(f"Uusia Suomi-aiheisia uutisia: {len(new_items)}")
+    return new_items
 
 
 # ---------------------------------------------------------------------------
 # HTML-pätkien rakentaminen
 # ---------------------------------------------------------------------------
 
-def build_recent_html(history: dict) -> str:
-    cutoff = datetime.utcnow().date() - timedelta(days=7)
-
+def build_recent_html(items: list[dict]) -> str:
+    """Rakenna 7 päivän uutislista ikkunan uutisista (news_store.items_since, uusin ensin)."""
     primary_rows: list[str] = []
     other_rows: list[str] = []
 
-    for item in history["items"]:
-        try:
-            d = datetime.strptime(item.get("published", "1970-01-01"), "%Y-%m-%d").date()
-        except Exception:
-            continue
-
-        if d < cutoff:
-            continue
+    # Saman jutun kopiot (news_dedupe) kootaan yhdelle riville; uusin toimii pääriveinä.
+    groups: dict = {}
+    for item in items:
+        key = item.get("cluster") or ("link", item.get("link", ""))
+        groups.setdefault(key, []).append(item)
 
+    for group in groups.values():
+        item = group[0]
         title_raw = item.get("title", "").strip()
         link_raw = item.get("link", "").strip()
         source_raw = item.get("source", "")
@@ -409,18 +912,28 @@ def build_recent_html(history: dict) -> str:
         source = html.escape(source_raw)
         lang = html.escape(lang_raw)
 
-        stored_text = item.get("text")
-        if isinstance(stored_text, str) and stored_text:
-            text_lower = stored_text
-        else:
-            text_lower = f"{title_raw} {source_raw}".lower()
-
-        has_country = any(kw in text_lower for kw in KEYWORDS_COUNTRY)
-        has_local = any(kw in text_lower for kw in KEYWORDS_LOCAL)
-
+        matches: set[str] = set()
+        for member in group:
+            member_matches = member.get("matches")
+            if not isinstance(member_matches, list):
+                member_matches = match_keyword_groups(
+                    f"{member.get('title', '')} {member.get('source', '')}"
+                )
+            matches.update(member_matches)
+
+        has_country = "country" in matches
+        has_local = "local" in matches
+
+        also = [
+            f'<a href="{html.escape(m.get("link", "").strip())}" target="_blank" rel="noopener">'
+            f'{html.escape(m.get("source", ""))} ({html.escape(m.get("lang", "").upper())})</a>'
+            for m in group[1:]
+        ]
         line = (
             f'  <li><a href="{link}" target="_blank" rel="noopener">'
-            f"{title} – {source} ({lang})</a></li>"
+            f"{title} – {source} ({lang})</a>"
+            + (f" · myös: {', '.join(also)}" if also else "")
+            + "</li>"
         )
 
         if has_country:
@@ -449,40 +962,7 @@ def build_recent_html(history: dict) -> str:
     return "\n".join(rows)
 
 
-def build_archive_pages_and_index_list(history: dict) -> str:
-    by_year: dict[str, list[dict]] = {}
-    for item in history["items"]:
-        published = item.get("published", "")
-        if len(published) < 4:
-            continue
-        year = published[:4]
-        by_year.setdefault(year, []).append(item)
-
-    index_items: list[str] = []
-
-    for year, items in sorted(by_year.items(), reverse=True):
-        page_name = f"uutisiasuomesta-{year}.html"
-        page_path = ROOT / page_name
-
-        li_rows: list[str] = []
-        for it in items:
-            title = html.escape(it.get("title", "").strip())
-            link = html.escape(it.get("link", "").strip())
-            source = html.escape(it.get("source", ""))
-            lang = html.escape(it.get("lang", "").upper())
-            date = html.escape(it.get("published", ""))
-
-            li_rows.append(
-                f'        <li><a href="{link}" target="_blank" rel="noopener">'
-                f"{date}: {title} – {source} ({lang})</a></li>"
-            )
-
-        if not li_rows:
-            year_list = '        <li class="muted">Ei uutisia tälle vuodelle.</li>'
-        else:
-            year_list = "\n".join(li_rows)
-
-        page_html = f"""<!doctype html>
+ARCHIVE_PAGE_TEMPLATE = """<!doctype html>
 <html lang="fi">
   <head>
     <meta charset="utf-8">
@@ -535,13 +1015,73 @@ def build_archive_pages_and_index_list(history: dict) -> str:
   </body>
 </html>
 """
-        page_path.write_text(page_html, encoding="utf-8")
+
+# Vuosisivun syötteisiin otetaan mukaan pohjan tiiviste, jotta pohjan
+# muuttaminen renderöi kaikki vuodet uudelleen.
+ARCHIVE_TEMPLATE_HASH = hashlib.sha1(ARCHIVE_PAGE_TEMPLATE.encode("utf-8")).hexdigest()[:12]
+
+
+def render_archive_page(year: str, items: list[dict]) -> str:
+    li_rows: list[str] = []
+    for it in items:
+        title = html.escape(it.get("title", "").strip())
+        link = html.escape(it.get("link", "").strip())
+        source = html.escape(it.get("source", ""))
+        lang = html.escape(it.get("lang", "").upper())
+        date = html.escape(it.get("published", ""))
+
+        li_rows.append(
+            f'        <li><a href="{link}" target="_blank" rel="noopener">'
+            f"{date}: {title} – {source} ({lang})</a></li>"
+        )
+
+    if not li_rows:
+        year_list = '        <li class="muted">Ei uutisia tälle vuodelle.</li>'
+    else:
+        year_list = "\n".join(li_rows)
+
+    return ARCHIVE_PAGE_TEMPLATE.format(year=year, year_list=year_list)
+
+
+def build_archive_pages_and_index_list(conn, graph: BuildGraph) -> str:
+    """Renderöi vain ne vuosisivut, joiden uutisjoukko, pohja tai renderöintikoodi on muuttunut.
+
+    Indeksilista kootaan kannan vuosikohtaisista määristä lukematta vuosien rivejä.
+    """
+    index_items: list[str] = []
+    rendered = 0
+    skipped = 0
+    recipe = {"scripts/generate_news.py": graph.file(Path(__file__))}
+
+    for year, count, year_fingerprint in news_store.year_summaries(conn):
+        page_path = ROOT / f"uutisiasuomesta-{year}.html"
+
+        def render(year=year, page_path=page_path) -> None:
+            items = news_store.items_for_year(conn, year)
+            page_path.write_text(render_archive_page(year, items), encoding="utf-8")
+
+        built = graph.build(
+            page_path.name,
+            lambda year_fingerprint=year_fingerprint: {
+                f"uutiset {year}": year_fingerprint,
+                "pohja": ARCHIVE_TEMPLATE_HASH,
+                **recipe,
+            },
+            render,
+            outputs=[page_path],
+        )
+        if built:
+            rendered += 1
+        else:
+            skipped += 1
 
         index_items.append(
             f'  <li><a href="/uutisiasuomesta-{year}.html">'
-            f"Vuoden {year} uutiskooste ({len(items)} linkkiä)</a></li>"
+            f"Vuoden {year} uutiskooste ({count} linkkiä)</a></li>"
         )
 
+    print(f"Vuosiarkistot: {rendered} sivua renderöity, {skipped} ohitettu (ei muutoksia).")
+
     if not index_items:
         return '  <li class="muted">Arkistoja ei vielä ole.</li>'
 
@@ -557,40 +1097,91 @@ def patch_between_markers(html_text: str, start_marker: str, end_marker: str, ne
     return html_text[:start_end] + "\n" + new_block + "\n" + html_text[end:]
 
 
-def update_index_page(history: dict) -> None:
+def update_index_page(conn, graph: BuildGraph | None = None) -> None:
+    """Päivitä uutissivu ja vuosiarkistot, jos niiden syötteet ovat muuttuneet."""
     if not NEWS_INDEX_PAGE.exists():
         print(f"VAROITUS: Index-sivua ei löytynyt: {NEWS_INDEX_PAGE}")
         return
 
-    try:
-        html_text = NEWS_INDEX_PAGE.read_text(encoding="utf-8")
-    except Exception as e:
-        print(f"VAROITUS: Index-sivun lukeminen epäonnistui: {e}")
-        return
+    own_graph = graph is None
+    if own_graph:
+        graph = BuildGraph(BUILD_STATE_PATH, ROOT)
 
-    recent_block = build_recent_html(history)
-    archive_block = build_archive_pages_and_index_list(history)
+    cutoff = (datetime.utcnow().date() - timedelta(days=7)).isoformat()
+    archive_block = build_archive_pages_and_index_list(conn, graph)
 
-    html_text = patch_between_markers(
-        html_text,
-        "<!-- AI-NEWS-RECENT-START -->",
-        "<!-- AI-NEWS-RECENT-END -->",
-        recent_block,
-    )
-    html_text = patch_between_markers(
-        html_text,
-        "<!-- AI-NEWS-ARCHIVES-START -->",
-        "<!-- AI-NEWS-ARCHIVES-END -->",
-        archive_block,
-    )
+    def inputs() -> dict[str, str]:
+        return {
+            NEWS_INDEX_PAGE.name: graph.file(NEWS_INDEX_PAGE),
+            "uutiset 7 pv": news_store.window_fingerprint(conn, cutoff),
+            "arkistolista": fingerprint(archive_block),
+            "scripts/generate_news.py": graph.file(Path(__file__)),
+        }
+
+    def render() -> None:
+        try:
+            html_text = NEWS_INDEX_PAGE.read_text(encoding="utf-8")
+        except Exception as e:
+            print(f"VAROITUS: Index-sivun lukeminen epäonnistui: {e}")
+            return
+
+        recent_block = build_recent_html(news_store.items_since(conn, cutoff))
+        html_text = patch_between_markers(
+            html_text,
+            "<!-- AI-NEWS-RECENT-START -->",
+            "<!-- AI-NEWS-RECENT-END -->",
+            recent_block,
+        )
+        html_text = patch_between_markers(
+            html_text,
+            "<!-- AI-NEWS-ARCHIVES-START -->",
+            "<!-- AI-NEWS-ARCHIVES-END -->",
+            archive_block,
+        )
+        NEWS_INDEX_PAGE.write_text(html_text, encoding="utf-8")
 
-    NEWS_INDEX_PAGE.write_text(html_text, encoding="utf-8")
+    graph.build(NEWS_INDEX_PAGE.name, inputs, render)
+    if own_graph:
+        graph.save()
 
 
 def main() -> None:
-    history = collect_news()
-    save_history(history)
-    update_index_page(history)
+    parser = argparse.ArgumentParser(description="Päivitä Uutisia Suomesta -sivut.")
+    parser.add_argument(
+        "--import-json",
+        action="store_true",
+        help="tuo news_history.json tietokantaan (tunnetut linkit ohitetaan) ja lopeta",
+    )
+    parser.add_argument(
+        "--export-json",
+        action="store_true",
+        help="kirjoita koko tietokanta news_history.json-tiedostoon ja lopeta",
+    )
+    args = parser.parse_args()
+
+    conn = open_history_store()
+    try:
+        if args.import_json:
+            added = news_store.add_items(conn, load_history()["items"])
+            print(f"Tuotiin {added} uutista tietokantaan.")
+            return
+        if args.export_json:
+            save_history(news_store.export_history(conn))
+            print(f"Kirjoitettiin {NEWS_HISTORY_PATH}")
+            return
+
+        collect_news(conn)
+        removed = news_store.apply_retention(conn, RETENTION_DAYS, datetime.utcnow().date().isoformat())
+        if removed:
+            news_dedupe.forget_removed(conn)
+            print(f"Säilytysaika ylittyi: poistettiin {removed} vanhaa uutista.")
+        hashed, duplicates = news_dedupe.assign_clusters(conn)
+        print(f"Kopioiden tunnistus: {hashed} uutta allekirjoitusta, {duplicates} kopiota yhdistetty.")
+        update_index_page(conn)
+        if save_history(news_store.export_history(conn)):
+            print(f"Historia tallennettu: {NEWS_HISTORY_PATH.name}")
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
@@ -1,28 +1,73 @@
 import os
+import re
+import sys
+import argparse
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
 from pathlib import Path
-from textwrap import dedent
 import base64
 
-import requests
+from openai_client import OpenAIClient, StructureError
+from response_cache import CACHE_TTL_HOURS, ResponseCache
+from post_manifest import PostManifest
+from post_similarity import INDEX_PATH, SimilarityIndex
+from site_template import render_post
 
 API_KEY = os.environ["OPENAI_API_KEY"]
-API_URL = "https://api.openai.com/v1/chat/completions"
+_client: OpenAIClient | None = None
+# --reuse-cache: välimuistin vastaukset kelpaavat iästä riippumatta.
+_reuse_cache = False
 
 ROOT = Path(__file__).resolve().parents[1]
 POSTS_DIR = ROOT / "posts"
-INDEX_FILE = ROOT / "index.html"
 IMAGES_DIR = ROOT / "assets" / "images"
 IMAGE_CATEGORIES = {"talous", "ruoka", "yhteiskunta", "teema"}
 
-TALOUS_INDEX_FILE = ROOT / "talous.html"
-RUOKA_INDEX_FILE = ROOT / "ruoka.html"
-YHTEISKUNTA_INDEX_FILE = ROOT / "yhteiskunta.html"
-TEEMA_INDEX_FILE = ROOT / "teema.html"
-
 TODAY = datetime.utcnow().date()
 
+MANIFEST_PATH = ROOT / "data" / "post_manifest.json"
+_manifest: PostManifest | None = None
+_similarity_index: SimilarityIndex | None = None
+_similarity_lock = threading.Lock()
+
+# Suositeltu juttu vaatii vähintään tämän kosinisamankaltaisuuden; muuten
+# paikka täytetään saman kategorian uusimmalla jutulla.
+MIN_RELATED_SCORE = 0.05
+
+# Artikkelit generoidaan virtana, jolloin rakennevirhe huomataan heti eikä
+# vasta koko vastauksen jälkeen. OPENAI_STREAM=0 palauttaa kertavastauksen.
+OPENAI_STREAM = os.environ.get("OPENAI_STREAM", "1") != "0"
+# Montako kertaa rakennevirheen jälkeen yritetään uudelleen; viimeinen yritys
+# hyväksytään tarkistamatta, kuten ennen virtausta.
+STRUCTURE_RETRIES = 2
+# Vastauksessa ei saa olla dokumenttikääreitä eikä Markdown-koodiaitaa. Tagit
+# tunnistetaan kokonaisina, joten <header> ja <bodytext> eivät osu; tagin
+# nimen perässä on oltava välilyönti, > tai /, jottei virran keskeltä
+# katkennut "<head" (myöhemmin <header>) hylkää vastausta.
+FORBIDDEN_WRAPPER_RE = re.compile(r"<(?:!doctype|html|head|body)(?=[\s>/])|```")
+H1_MAX_CHARS = 300
+MIN_SECTIONS = 3
+
+# Paikallinen uutuustarkistus: luonnos, jonka kosinisamankaltaisuus johonkin
+# aiempaan juttuun on vähintään tämä, generoidaan uudelleen. Nykyisessä
+# arkistossa toistensa kierrätyksiä olevat jutut asettuvat välille 0.30-0.40.
+NOVELTY_THRESHOLD = float(os.environ.get("POST_NOVELTY_THRESHOLD", "0.30"))
+NOVELTY_RETRIES = 2
+# Kehotteen lyhyt poissulkulista: kategorian uusimmat + koko sivuston uusimmat.
+EXCLUDE_CATEGORY_TITLES = 6
+EXCLUDE_RECENT_TITLES = 4
+
+_run_stats = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "drafts": 0, "rejected": 0}
+_run_stats_lock = threading.Lock()
+
+# Montako kategoriaa (teksti + viikon kuva) generoidaan yhtä aikaa.
+# POST_WORKERS=1 palauttaa peräkkäisen generoinnin.
+POST_WORKERS = int(os.environ.get("POST_WORKERS", "4"))
+# Jokaisella kategorialla voi olla teksti- ja kuvakutsu yhtä aikaa käynnissä.
+OPENAI_IN_FLIGHT = int(os.environ.get("OPENAI_MAX_IN_FLIGHT", str(2 * max(1, POST_WORKERS))))
+
 
 def make_filename(kind: str) -> Path:
     """Kaikki aktiiviset kategoriat tallennetaan posts/kind/YYYY-MM-DD-kind.html."""
@@ -33,11 +78,36 @@ def post_exists(path: Path) -> bool:
     return path.exists()
 
 
-def call_openai(system_prompt: str, user_prompt: str) -> str:
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json",
-    }
+def get_openai_client() -> OpenAIClient:
+    """Yksi jaettu asiakas (yhteyspooli, uudelleenyritykset, rinnakkaisuusraja) ajoa kohden."""
+    global _client
+    if _client is None:
+        ttl_hours = None if _reuse_cache else CACHE_TTL_HOURS
+        _client = OpenAIClient(API_KEY, max_in_flight=OPENAI_IN_FLIGHT, cache=ResponseCache(ttl_hours=ttl_hours))
+    return _client
+
+
+def check_article_structure(text: str, done: bool) -> None:
+    """Nosta StructureError, jos (keskeneräinen) vastaus poikkeaa <h1>/<h2>-rungosta."""
+    head = text.lstrip()
+    lowered = head.lower()
+    wrapper = FORBIDDEN_WRAPPER_RE.search(lowered)
+    if wrapper:
+        raise StructureError(f"vastauksessa on {wrapper.group()}")
+    if not (head.startswith("<h1") or "<h1".startswith(head)):
+        raise StructureError("vastaus ei ala <h1>-otsikolla")
+    if lowered.count("<h1") > 1:
+        raise StructureError("vastauksessa on useampi <h1>")
+    if "</h1>" not in lowered and len(head) > H1_MAX_CHARS:
+        raise StructureError("<h1>-otsikko ei sulkeudu")
+    if done:
+        if "</h1>" not in lowered:
+            raise StructureError("<h1>-otsikko ei sulkeudu")
+        if lowered.count("<h2") < MIN_SECTIONS:
+            raise StructureError(f"vastauksessa on alle {MIN_SECTIONS} <h2>-väliotsikkoa")
+
+
+def call_openai(system_prompt: str, user_prompt: str, check=None) -> str:
     payload = {
         "model": "gpt-4.1-mini",
         "messages": [
@@ -47,55 +117,70 @@ def call_openai(system_prompt: str, user_prompt: str) -> str:
         "temperature": 0.55,
     }
 
-    resp = requests.post(API_URL, headers=headers, json=payload, timeout=60)
-    if resp.status_code != 200:
-        raise RuntimeError(f"OpenAI API error: {resp.status_code} {resp.text}")
-
-    data = resp.json()
+    client = get_openai_client()
+    if not OPENAI_STREAM:
+        data = client.post("chat/completions", payload, timeout=60)
+    else:
+        for attempt in range(STRUCTURE_RETRIES + 1):
+            last = attempt == STRUCTURE_RETRIES
+            try:
+                data = client.stream_chat(payload, timeout=60, check=None if last else check)
+                break
+            except StructureError as e:
+                print(f"VAROITUS: OpenAI-vastaus katkaistiin ({e}), uusi yritys {attempt + 1}/{STRUCTURE_RETRIES}")
+
+    usage = data.get("usage") or {}
+    with _run_stats_lock:
+        _run_stats["calls"] += 1
+        _run_stats["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        _run_stats["completion_tokens"] += usage.get("completion_tokens") or 0
+    if usage:
+        print(f"OpenAI-kutsu: {usage.get('prompt_tokens', '?')} kehotetokenia, "
+              f"{usage.get('completion_tokens', '?')} vastaustokenia")
     try:
         return data["choices"][0]["message"]["content"]
     except Exception as e:
         raise RuntimeError(f"Unexpected response format: {json.dumps(data)[:500]}") from e
 
 
-def _extract_title_from_document(doc_html: str) -> str:
-    start = doc_html.find("<title>")
-    end = doc_html.find("</title>")
-    if start != -1 and end != -1:
-        return doc_html[start + 7:end].strip()
-    start = doc_html.find("<h1>")
-    end = doc_html.find("</h1>")
-    if start != -1 and end != -1:
-        return doc_html[start + 4:end].strip()
-    return "AISuomi – artikkeli"
+def get_manifest() -> PostManifest:
+    """Artikkelimanifesti ladataan kerran ajoa kohden (uudet tiedostot luetaan)."""
+    global _manifest
+    if _manifest is None:
+        _manifest = PostManifest.load(MANIFEST_PATH, ROOT, POSTS_DIR)
+    return _manifest
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """Sisältösamankaltaisuuden indeksi ladataan kerran ajoa kohden."""
+    global _similarity_index
+    with _similarity_lock:
+        if _similarity_index is None:
+            _similarity_index = SimilarityIndex.load(get_manifest(), INDEX_PATH)
+    return _similarity_index
 
 
 def get_recent_titles(limit: int = 40) -> list[str]:
-    """Kerää uusimpien juttujen otsikoita, jotta AI ei kierrätä samoja aiheita."""
-    posts: list[tuple[datetime, str]] = []
-    if not POSTS_DIR.exists():
-        return []
+    """Kerää uusimpien juttujen otsikoita, jotta AI ei kierrätä samoja aiheita.
+
+    Otsikot tulevat manifestin valmiiksi lajitelluista riveistä, joten
+    artikkelitiedostoja tai hakemistoja ei lueta.
+    """
+    return [entry["title"] for _, entry in get_manifest().posts(limit=limit) if entry.get("title")]
 
-    for p in POSTS_DIR.rglob("*.html"):
-        try:
-            d = datetime.strptime(p.name[:10], "%Y-%m-%d")
-        except ValueError:
-            continue
-        try:
-            title = _extract_title_from_document(p.read_text(encoding="utf-8", errors="ignore"))
-        except Exception:
-            continue
-        if title:
-            posts.append((d, title))
 
-    posts.sort(key=lambda item: item[0], reverse=True)
-    return [title for _, title in posts[:limit]]
+def get_exclusion_titles(kind: str) -> list[str]:
+    """Kehotteen poissulkulista: kategorian ja koko sivuston uusimmat otsikot."""
+    candidates = [entry["title"] for _, entry in get_manifest().posts({kind}, limit=EXCLUDE_CATEGORY_TITLES)]
+    candidates += get_recent_titles(limit=EXCLUDE_RECENT_TITLES)
+    return list(dict.fromkeys(title for title in candidates if title))
 
 
-def generate_article(kind: str) -> str:
+def generate_article(kind: str, exclude_titles: list[str] | None = None) -> str:
     """AISuomi 2.0: konkreettista talous-, yhteiskunta- ja arki-analyysiä."""
-    recent_titles = get_recent_titles(limit=40)
-    recent_titles_text = "\n".join(f"- {title}" for title in recent_titles) or "- Ei aiempia otsikoita käytettävissä."
+    if exclude_titles is None:
+        exclude_titles = get_exclusion_titles(kind)
+    exclude_titles_text = "\n".join(f"- {title}" for title in exclude_titles) or "- Ei aiempia otsikoita käytettävissä."
 
     system_prompt = """
 Olet AISuomi.blogin autonominen suomalainen AI-toimitus.
@@ -189,7 +274,7 @@ AISuomi on autonominen suomalainen AI-media. Se tarkastelee Suomen arkea, talout
 {topic_hint}
 
 Viimeisimmät otsikot, joita EI saa toistaa eikä kierrättää:
-{recent_titles_text}
+{exclude_titles_text}
 
 Kirjoita rakenne näin:
 <h1>Selkeä ja konkreettinen otsikko</h1>
@@ -224,7 +309,42 @@ Tyyli:
 Pituus: 700-1000 sanaa.
 """
 
-    return call_openai(system_prompt, user_prompt)
+    return call_openai(system_prompt, user_prompt, check=check_article_structure)
+
+
+def generate_novel_article(kind: str, exclude_titles: list[str]) -> str:
+    """Generoi juttu ja tarkista se paikallisesti koko arkistoa vasten.
+
+    Liian lähellä aiempaa juttua oleva luonnos generoidaan uudelleen niin, että
+    sen otsikko ja lähimmät jutut lisätään poissulkulistaan. Jos kaikki
+    yritykset hylätään, käytetään vähiten samankaltaista luonnosta.
+    """
+    exclude = list(exclude_titles)
+    best: tuple[float, str] | None = None
+    for attempt in range(NOVELTY_RETRIES + 1):
+        body = generate_article(kind, exclude)
+        neighbours = get_similarity_index().query(body, 3)
+        score = neighbours[0][1] if neighbours else 0.0
+        with _run_stats_lock:
+            _run_stats["drafts"] += 1
+        if best is None or score < best[0]:
+            best = (score, body)
+        if score < NOVELTY_THRESHOLD:
+            return body
+
+        with _run_stats_lock:
+            _run_stats["rejected"] += 1
+        print(f"VAROITUS: {kind}-luonnos on liian lähellä juttua {neighbours[0][0]} "
+              f"(samankaltaisuus {score:.2f}), yritys {attempt + 1}/{NOVELTY_RETRIES + 1}")
+        close_titles = [extract_title(body, kind)]
+        for key, other_score in neighbours:
+            entry = get_manifest().get(ROOT / key)
+            if other_score >= NOVELTY_THRESHOLD and entry:
+                close_titles.append(entry["title"])
+        exclude.extend(title for title in close_titles if title not in exclude)
+
+    print(f"VAROITUS: {kind}: kaikki luonnokset hylättiin, käytetään vähiten samankaltaista ({best[0]:.2f})")
+    return best[1]
 
 
 def extract_title(html_body: str, kind: str) -> str:
@@ -263,10 +383,6 @@ def ensure_category_image(kind: str, week_key: str) -> str:
     }
     prompt = prompt_map.get(kind, "rauhallinen ja neutraali kuvitus suomalaisesta arjesta")
 
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json",
-    }
     payload = {
         "model": "gpt-image-1",
         "prompt": prompt,
@@ -275,11 +391,9 @@ def ensure_category_image(kind: str, week_key: str) -> str:
         "response_format": "b64_json",
     }
 
-    resp = requests.post("https://api.openai.com/v1/images", headers=headers, json=payload, timeout=120)
-    if resp.status_code != 200:
-        raise RuntimeError(f"OpenAI Images API error: {resp.status_code} {resp.text}")
-
-    data = resp.json()
+    # Pyyntö on joka viikko sama; viikko kuuluu välimuistin avaimeen, jotta
+    # uudelleenajo uutena viikkona ei tallenna viime viikon kuvaa uudella nimellä.
+    data = get_openai_client().post("images", payload, timeout=120, cache_tag=week_key)
     img_bytes = base64.b64decode(data["data"][0]["b64_json"])
     img_path.write_bytes(img_bytes)
     return f"/assets/images/{kind}/{filename}"
@@ -289,254 +403,124 @@ def get_category_image_for_current_week(kind: str) -> str:
     return ensure_category_image(kind, get_week_key(TODAY))
 
 
-def get_related_posts(kind: str, current_path: Path, max_items: int = 2) -> list[tuple[str, str]]:
-    results: list[tuple[datetime, Path]] = []
-    base_dir = POSTS_DIR / kind
-    pattern = f"*-{kind}.html"
-
-    for p in base_dir.glob(pattern):
-        if p == current_path:
-            continue
-        try:
-            d = datetime.strptime(p.name[:10], "%Y-%m-%d")
-        except ValueError:
-            continue
-        results.append((d, p))
-
-    results.sort(key=lambda item: item[0], reverse=True)
+def get_related_posts(kind: str, current_path: Path, max_items: int = 2,
+                      html_body: str | None = None) -> list[tuple[str, str]]:
+    """Sisällöltään lähimmät jutut koko arkistosta; vajaat paikat kategorian uusimmilla."""
+    current_key = current_path.relative_to(ROOT).as_posix()
+    manifest = get_manifest()
     out: list[tuple[str, str]] = []
-    for _, p in results[:max_items]:
-        doc_html = p.read_text(encoding="utf-8", errors="ignore")
-        title = _extract_title_from_document(doc_html)
-        href = f"/{p.relative_to(ROOT).as_posix()}"
-        out.append((href, title))
+    seen = {current_key}
+
+    if html_body:
+        for key, score in get_similarity_index().query(html_body, max_items, exclude={current_key}):
+            entry = manifest.get(ROOT / key)
+            if score < MIN_RELATED_SCORE or not entry:
+                continue
+            out.append((f"/{key}", entry["title"]))
+            seen.add(key)
+
+    prefix = f"{(POSTS_DIR / kind).relative_to(ROOT).as_posix()}/"
+    for key, entry in manifest.posts({kind}):
+        if len(out) >= max_items:
+            break
+        if key in seen or not key.startswith(prefix) or not key.endswith(f"-{kind}.html"):
+            continue
+        out.append((f"/{key}", entry["title"]))
     return out
 
 
-def write_post(path: Path, kind: str, html_body: str) -> str:
+def write_post(path: Path, kind: str, html_body: str, image_src: str | None = None) -> str:
+    """Kirjoita artikkeli. image_src=None hakee viikon kuvan, "" = ei kuvaa."""
     title = extract_title(html_body, kind)
     relative = path.relative_to(ROOT)
     post_url = f"https://aisuomi.blog/{relative.as_posix()}"
 
-    image_src = None
-    try:
-        image_src = get_category_image_for_current_week(kind)
-    except Exception as e:
-        print(f"Ei voitu hakea kuvituskuvaa kategorialle {kind}: {e}")
-
-    hero_html = ""
-    if image_src:
-        hero_html = f"""
-        <figure class="post-hero">
-          <img src="{image_src}" alt="{title} – kuvituskuva">
-          <figcaption class="muted">Kuvituskuva: autonomisesti luotu AI-kuva.</figcaption>
-        </figure>
-        """
-
-    related_links = get_related_posts(kind, path, max_items=2)
-    related_html = ""
-    if related_links:
-        items_html = "\n".join(f'<li><a href="{href}">{rtitle}</a></li>' for href, rtitle in related_links)
-        related_html = f"""
-        <div class="card">
-          <h2>Suositellut jutut</h2>
-          <p class="muted">Muita AISuomi-tekstejä samasta aihepiiristä.</p>
-          <ul>{items_html}</ul>
-        </div>
-        """
-
-    document = f"""<!doctype html>
-<html lang="fi">
-  <head>
-    <meta charset="utf-8">
-    <title>{title}</title>
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <link rel="stylesheet" href="/assets/styles.css">
-  </head>
-  <body>
-    <header class="site-header">
-      <h1>{title}</h1>
-      <p class="tagline">Autonominen AISuomi-artikkeli ({kind}).</p>
-    </header>
-
-    <nav class="top-nav">
-      <a href="/">Etusivu</a>
-      <a href="/talous.html">Talous</a>
-      <a href="/ruoka.html">Ruoka</a>
-      <a href="/yhteiskunta.html">Yhteiskunta</a>
-      <a href="/teema.html">Teema</a>
-      <a href="/uutisiasuomesta.html">Uutisia Suomesta</a>
-      <a href="/privacy.html">Tietosuoja</a>
-      <a href="/cookies.html">Evästeet</a>
-    </nav>
-
-    <main class="layout">
-      <section class="main-column">
-        {hero_html}
-        {html_body}
-
-        <div class="card">
-          <h2>Jaa tämä juttu</h2>
-          <p class="muted">Voit halutessasi jakaa AISuomi-jutun eteenpäin.</p>
-          <p class="share-links">
-            <a href="https://www.facebook.com/sharer/sharer.php?u={post_url}" target="_blank" rel="noopener">Jaa Facebookissa</a><br>
-            <a href="https://twitter.com/intent/tweet?url={post_url}" target="_blank" rel="noopener">Jaa X:ssä</a><br>
-            <a href="https://api.whatsapp.com/send?text={post_url}" target="_blank" rel="noopener">Jaa WhatsAppissa</a>
-          </p>
-        </div>
-
-        {related_html}
-      </section>
-      <aside class="sidebar">
-        <div class="card">
-          <h2>Huomio</h2>
-          <p class="muted">Teksti on tekoälyn tuottamaa sisältöä. Ihminen ei ole editoinut sitä ennen julkaisua.</p>
-        </div>
-        <div class="card">
-          <h3>Tue AISuomi-projektia</h3>
-          <p>Tämä blogi toimii täysin autonomisesti tekoälyn ohjaamana.</p>
-          <p style="text-align:center; margin-top:0.5rem;">
-            <a href="https://buymeacoffee.com/aisuomi" target="_blank" rel="noopener" style="text-decoration:none; font-weight:600;">→ Siirry tukisivulle</a>
-          </p>
-          <p class="muted">Tukeminen on vapaaehtoista eikä vaikuta sisältöön.</p>
-        </div>
-      </aside>
-    </main>
-
-    <footer class="site-footer">
-      AISuomi – autonominen suomalainen AI-media.
-      | <a href="/">Etusivu</a>
-      | <a href="/talous.html">Talous</a>
-      | <a href="/ruoka.html">Ruoka</a>
-      | <a href="/yhteiskunta.html">Yhteiskunta</a>
-      | <a href="/teema.html">Teema</a>
-      | <a href="/privacy.html">Tietosuoja</a>
-      | <a href="/cookies.html">Evästeet</a>
-      | <a href="/contact.html">Yhteys</a>
-    </footer>
-  </body>
-</html>
-"""
-    path.write_text(dedent(document), encoding="utf-8")
+    if image_src is None:
+        try:
+            image_src = get_category_image_for_current_week(kind)
+        except Exception as e:
+            print(f"Ei voitu hakea kuvituskuvaa kategorialle {kind}: {e}")
+
+    related_links = get_related_posts(kind, path, max_items=2, html_body=html_body)
+    document = render_post(
+        title=title,
+        kind=kind,
+        body=html_body,
+        post_url=post_url,
+        image_src=image_src or "",
+        related=related_links,
+    )
+    path.write_text(document, encoding="utf-8")
+    entry = get_manifest().update(path)
+    get_similarity_index().add(relative.as_posix(), document, entry["sha256"])
     return title
 
 
 def get_last_post_date(dir_path: Path, kind: str):
-    dates = []
-    for p in dir_path.glob(f"*-{kind}.html"):
-        try:
-            dates.append(datetime.strptime(p.name[:10], "%Y-%m-%d").date())
-        except ValueError:
-            continue
-    return max(dates) if dates else None
-
+    prefix = f"{dir_path.relative_to(ROOT).as_posix()}/"
+    for key, entry in get_manifest().posts():
+        if key.startswith(prefix) and "/" not in key[len(prefix):] and key.endswith(f"-{kind}.html"):
+            return date.fromisoformat(entry["date"])
+    return None
 
-def update_index_file(index_path: Path, new_links: list[tuple[str, str]]):
-    if not new_links or not index_path.exists():
-        return
-    html = index_path.read_text(encoding="utf-8")
-    marker = '<ul class="post-list">'
-    idx = html.find(marker)
-    if idx == -1:
-        return
-    insert_at = idx + len(marker)
-    items = [f'<li><a href="{href}">{title}</a></li>' for href, title in new_links]
-    middle = "\n        " + "\n        ".join(items) + "\n"
-    index_path.write_text(html[:insert_at] + middle + html[insert_at:], encoding="utf-8")
 
-
-def _collect_rss_entry(path: Path, base_url: str):
+def _fetch_image_or_empty(kind: str) -> str:
     try:
-        d = datetime.strptime(path.name[:10], "%Y-%m-%d")
-    except ValueError:
-        return None
-    html = path.read_text(encoding="utf-8")
-    title = _extract_title_from_document(html)
-    link = f"{base_url}/{path.relative_to(ROOT).as_posix()}"
-    return d, link, title
-
-
-def build_rss_feed(base_url: str = "https://aisuomi.blog"):
-    rss_path = ROOT / "rss.xml"
-    entries: list[tuple[datetime, str, str]] = []
+        return get_category_image_for_current_week(kind)
+    except Exception as e:
+        print(f"Ei voitu hakea kuvituskuvaa kategorialle {kind}: {e}")
+        return ""
 
-    for sub in ("talous", "ruoka", "yhteiskunta", "teema"):
-        subdir = POSTS_DIR / sub
-        if subdir.exists():
-            for p in subdir.glob("*.html"):
-                e = _collect_rss_entry(p, base_url)
-                if e:
-                    entries.append(e)
-
-    if not entries:
-        return
-
-    entries.sort(key=lambda x: x[0], reverse=True)
-    entries = entries[:50]
-    last_build = entries[0][0].strftime("%a, %d %b %Y %H:%M:%S +0000")
-
-    items_xml = []
-    for pub_date, link, title in entries:
-        pub_str = pub_date.strftime("%a, %d %b %Y %H:%M:%S +0000")
-        items_xml.append(f"""    <item>
-      <title>{title}</title>
-      <link>{link}</link>
-      <guid>{link}</guid>
-      <pubDate>{pub_str}</pubDate>
-    </item>""")
-
-    rss_xml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<rss version="2.0">
-  <channel>
-    <title>AISuomi – autonominen suomalainen AI-media</title>
-    <link>{base_url}/</link>
-    <description>Autonomisesti tekoälyn tuottamia suomenkielisiä artikkeleita Suomen arjesta, taloudesta ja yhteiskunnasta.</description>
-    <language>fi</language>
-    <lastBuildDate>{last_build}</lastBuildDate>
-{os.linesep.join(items_xml)}
-  </channel>
-</rss>
-"""
-    rss_path.write_text(rss_xml, encoding="utf-8")
 
+def generate_posts(jobs: list[tuple[str, Path]]) -> tuple[dict[str, str], list[str]]:
+    """Generoi kategoriat rinnakkain. Palauttaa ({kind: otsikko} onnistuneille,
+    epäonnistuneet kategoriat).
 
-def build_sitemap(base_url: str = "https://aisuomi.blog"):
-    sitemap_path = ROOT / "sitemap.xml"
-    urls: list[str] = []
+    Jokaisen kategorian viikkokuva haetaan omana tehtävänään samaan aikaan
+    tekstin kanssa. Epäonnistunut kategoria ei kaada muita.
+    """
+    titles: dict[str, str] = {}
+    failed: list[str] = []
+    if not jobs:
+        return titles, failed
 
-    root_files = [
-        "index.html", "talous.html", "ruoka.html", "yhteiskunta.html", "teema.html",
-        "privacy.html", "cookies.html", "uutisiasuomesta.html", "contact.html",
-    ]
-    for name in root_files:
-        p = ROOT / name
-        if p.exists():
-            urls.append(f"{base_url}/" if name == "index.html" else f"{base_url}/{name}")
+    # Poissulkulistat ja indeksi ennen rinnakkaisia töitä, jotta kehotteet eivät
+    # riipu siitä, mikä juttu ehti levylle ensin (ja välimuisti osuu uudelleenajossa).
+    exclude_titles = {kind: get_exclusion_titles(kind) for kind, _ in jobs}
+    get_similarity_index()
 
-    if POSTS_DIR.exists():
-        for p in POSTS_DIR.rglob("*.html"):
-            urls.append(f"{base_url}/{p.relative_to(ROOT).as_posix()}")
+    image_kinds = [kind for kind, _ in jobs if kind in IMAGE_CATEGORIES and POST_WORKERS > 1]
+    # Kuvilla on oma poolinsa, joten ne eivät vie tekstitehtävien työntekijöitä:
+    # jokainen teksti generoidaan samaan aikaan oman kuvansa kanssa.
+    with ThreadPoolExecutor(max_workers=max(1, len(image_kinds))) as image_pool, \
+            ThreadPoolExecutor(max_workers=max(1, POST_WORKERS)) as pool:
+        image_futures = {kind: image_pool.submit(_fetch_image_or_empty, kind) for kind in image_kinds}
 
-    unique_urls = []
-    seen = set()
-    for u in urls:
-        if u not in seen:
-            seen.add(u)
-            unique_urls.append(u)
+        def run(kind: str, path: Path) -> str:
+            body = generate_novel_article(kind, exclude_titles[kind])
+            image_future = image_futures.get(kind)
+            image_src = image_future.result() if image_future else None
+            return write_post(path, kind, body, image_src=image_src)
 
-    if not unique_urls:
-        return
+        futures = {kind: pool.submit(run, kind, path) for kind, path in jobs}
+        for kind, _ in jobs:
+            try:
+                titles[kind] = futures[kind].result()
+            except Exception as e:
+                print(f"VIRHE: Kategorian {kind} generointi epäonnistui: {e}")
+                failed.append(kind)
 
-    lines = [
-        '<?xml version="1.0" encoding="UTF-8"?>',
-        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
-    ]
-    lines.extend(f"  <url><loc>{loc}</loc></url>" for loc in unique_urls)
-    lines.append("</urlset>")
-    sitemap_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return titles, failed
 
 
 def main():
+    global _reuse_cache
+    parser = argparse.ArgumentParser(description="Generoi päivän artikkelit.")
+    parser.add_argument("--reuse-cache", action="store_true",
+                        help="käytä välimuistin OpenAI-vastauksia iästä riippumatta (uudelleenajo)")
+    args = parser.parse_args()
+    _reuse_cache = args.reuse_cache
+
     POSTS_DIR.mkdir(exist_ok=True)
     for sub in ("talous", "ruoka", "yhteiskunta", "teema"):
         (POSTS_DIR / sub).mkdir(exist_ok=True)
@@ -546,61 +530,56 @@ def main():
     ruoka_path = make_filename("ruoka")
     teema_path = make_filename("teema")
 
-    front_links: list[tuple[str, str]] = []
-    talous_links: list[tuple[str, str]] = []
-    yhteiskunta_links: list[tuple[str, str]] = []
-    ruoka_links: list[tuple[str, str]] = []
-    teema_links: list[tuple[str, str]] = []
+    jobs: list[tuple[str, Path]] = []
 
     # Päivittäiset pääjutut
     if not post_exists(talous_path):
-        body = generate_article("talous")
-        title = write_post(talous_path, "talous", body)
-        href = f"posts/talous/{talous_path.name}"
-        talous_links.append((href, title))
-        front_links.append((href, title))
-
+        jobs.append(("talous", talous_path))
     if not post_exists(yhteiskunta_path):
-        body = generate_article("yhteiskunta")
-        title = write_post(yhteiskunta_path, "yhteiskunta", body)
-        href = f"posts/yhteiskunta/{yhteiskunta_path.name}"
-        yhteiskunta_links.append((href, title))
-        front_links.append((href, title))
+        jobs.append(("yhteiskunta", yhteiskunta_path))
 
     # Viikoittaiset lisäjutut
     last_ruoka = get_last_post_date(POSTS_DIR / "ruoka", "ruoka")
     if (last_ruoka is None) or (TODAY - last_ruoka).days >= 7:
         if not post_exists(ruoka_path):
-            body = generate_article("ruoka")
-            title = write_post(ruoka_path, "ruoka", body)
-            ruoka_links.append((f"posts/ruoka/{ruoka_path.name}", title))
+            jobs.append(("ruoka", ruoka_path))
 
     last_teema = get_last_post_date(POSTS_DIR / "teema", "teema")
     if (last_teema is None) or (TODAY - last_teema).days >= 7:
         if not post_exists(teema_path):
-            body = generate_article("teema")
-            title = write_post(teema_path, "teema", body)
-            teema_links.append((f"posts/teema/{teema_path.name}", title))
-
-    if front_links:
-        update_index_file(INDEX_FILE, front_links)
-    if talous_links:
-        update_index_file(TALOUS_INDEX_FILE, talous_links)
-    if yhteiskunta_links:
-        update_index_file(YHTEISKUNTA_INDEX_FILE, yhteiskunta_links)
-    if ruoka_links:
-        update_index_file(RUOKA_INDEX_FILE, ruoka_links)
-    if teema_links:
-        update_index_file(TEEMA_INDEX_FILE, teema_links)
-
-    if not (front_links or talous_links or yhteiskunta_links or ruoka_links or teema_links):
+            jobs.append(("teema", teema_path))
+
+    titles, failed = generate_posts(jobs)
+    # Etusivun ja kategoriasivujen listat kootaan build_site.py:ssä manifestista.
+    if not titles:
         print("Ei uusia postauksia tälle päivälle.")
 
-    try:
-        build_rss_feed()
-        build_sitemap()
-    except Exception as e:
-        print(f"RSS/sitemap päivitys epäonnistui: {e}")
+    get_manifest().save()
+    if _similarity_index is not None:
+        _similarity_index.save()
+
+    if _run_stats["calls"]:
+        drafts, rejected = _run_stats["drafts"], _run_stats["rejected"]
+        print(f"Artikkelikutsut: {_run_stats['calls']}, kehotetokenit {_run_stats['prompt_tokens']}, "
+              f"vastaustokenit {_run_stats['completion_tokens']}")
+        if drafts:
+            print(f"Uutuustarkistus: {rejected}/{drafts} luonnosta hylätty ({rejected / drafts:.0%})")
+
+    if _client is not None:
+        stats = _client.stats
+        print(f"OpenAI: {stats['requests']} pyyntöä, {stats['retries']} uudelleenyritystä, "
+              f"{stats['throttled']} rajoitettua")
+        cache = _client.cache
+        cache.evict()
+        print(f"OpenAI-välimuisti: {cache.stats['hits']} osumaa, {cache.stats['misses']} ohi, "
+              f"{cache.stats['evicted']} poistettu")
+        _client.close()
+
+    # Onnistuneet jutut ja manifesti on tallennettu; epäonnistuminen näkyy
+    # workflow'ssa punaisena.
+    if failed:
+        print(f"VIRHE: Generointi epäonnistui kategorioille: {', '.join(failed)}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
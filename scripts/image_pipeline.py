@@ -0,0 +1,189 @@
+from pathlib import Path
+import argparse
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+
+try:
+    from PIL import Image  # valinnainen; ilman Pillowia kuvasta kirjataan vain mitat
+except ImportError:  # pragma: no cover - riippuu ympäristöstä
+    Image = None
+
+try:
+    import pillow_avif  # noqa: F401 - rekisteröi AVIF-tuen vanhempaan Pillowiin
+except ImportError:
+    pass
+
+
+# Kategorioiden viikkokuvien jälkikäsittely: gpt-image-1:n 1024x1024 PNG
+# pakataan WebP- (ja AVIF-, jos Pillow tukee) muotoon useana leveytenä ilman
+# metatietoja. Tulokset ja mitat kirjataan tiedostoon data/image_variants.json
+# lähdetiedoston sha256-tiivisteellä, joten jokainen kuva käsitellään vain kerran.
+#
+#   python scripts/image_pipeline.py assets/images/talous/2026-W42-talous.png
+
+ROOT = Path(__file__).resolve().parents[1]
+VARIANTS_PATH = ROOT / "data" / "image_variants.json"
+
+WIDTHS = (320, 640, 1024)
+WEBP_QUALITY = 80
+AVIF_QUALITY = 55
+
+# Artikkelin pääsarakkeen leveys: yksipalstaisena (<= 800px) koko näkymä
+# reunuksia vähennettynä, muuten noin 540px.
+HERO_SIZES = "(max-width: 800px) calc(100vw - 5.5rem), 540px"
+
+_lock = threading.Lock()
+
+
+def avif_supported() -> bool:
+    if Image is None:
+        return False
+    try:
+        from PIL import features
+
+        return bool(features.check("avif"))
+    except (ImportError, ValueError):
+        return ".avif" in Image.registered_extensions()
+
+
+def png_dimensions(data: bytes) -> tuple[int, int] | None:
+    """Leveys ja korkeus PNG:n IHDR-lohkosta (ilman Pillowia)."""
+    if data[:8] != b"\x89PNG\r\n\x1a\n" or data[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", data[16:24])
+
+
+def load_variants(path: Path = VARIANTS_PATH) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _is_current(entry: dict | None, sha: str, root: Path) -> bool:
+    if not entry or entry.get("sha256") != sha:
+        return False
+    if entry.get("variants"):
+        return all((root / v["src"].lstrip("/")).exists() for v in entry["variants"])
+    # Ilman Pillowia tehty merkintä käsitellään uudelleen, kun Pillow on saatavilla.
+    return Image is None
+
+
+def _encode_variants(src: Path, data: bytes, root: Path) -> tuple[int, int, list[dict]]:
+    with Image.open(io.BytesIO(data)) as opened:
+        opened.load()
+        has_alpha = "A" in opened.getbands() or "transparency" in opened.info
+        mode = "RGBA" if has_alpha else "RGB"
+        # Uusi kuva pelkistä pikseleistä: EXIF, ICC, tekstilohkot yms. jäävät pois.
+        pixels = opened.convert(mode)
+        clean = Image.frombytes(mode, pixels.size, pixels.tobytes())
+    width, height = clean.size
+
+    formats = [("webp", "image/webp", {"quality": WEBP_QUALITY, "method": 6})]
+    if avif_supported():
+        formats.insert(0, ("avif", "image/avif", {"quality": AVIF_QUALITY}))
+
+    variants = []
+    for target in sorted({w for w in WIDTHS if w < width} | {width}):
+        resized = clean if target == width else clean.resize(
+            (target, round(height * target / width)), Image.LANCZOS
+        )
+        for ext, mime, options in formats:
+            out = src.with_name(f"{src.stem}-{target}.{ext}")
+            tmp = out.with_suffix(f".{os.getpid()}.tmp")
+            resized.save(tmp, format=ext.upper(), **options)
+            os.replace(tmp, out)
+            variants.append({
+                "src": "/" + out.relative_to(root).as_posix(),
+                "type": mime,
+                "width": resized.width,
+                "height": resized.height,
+                "bytes": out.stat().st_size,
+            })
+    return width, height, variants
+
+
+def optimize_image(src: Path, root: Path = ROOT, variants_path: Path = VARIANTS_PATH) -> dict | None:
+    """Pakkaa kuva ja palauta {"width", "height", "variants": [...]}; None, jos kuvaa ei ole."""
+    try:
+        data = src.read_bytes()
+    except OSError:
+        return None
+    sha = hashlib.sha256(data).hexdigest()
+    key = src.relative_to(root).as_posix()
+
+    with _lock:
+        entry = load_variants(variants_path).get(key)
+    if _is_current(entry, sha, root):
+        return entry
+
+    if Image is not None:
+        try:
+            width, height, variants = _encode_variants(src, data, root)
+        except Exception as e:
+            print(f"VAROITUS: kuvan {key} pakkaus epäonnistui: {e}")
+            return None
+    else:
+        dims = png_dimensions(data)
+        if dims is None:
+            return None
+        (width, height), variants = dims, []
+
+    entry = {"sha256": sha, "width": width, "height": height, "bytes": len(data), "variants": variants}
+    with _lock:
+        all_entries = load_variants(variants_path)
+        all_entries[key] = entry
+        variants_path.parent.mkdir(parents=True, exist_ok=True)
+        with variants_path.open("w", encoding="utf-8") as f:
+            json.dump(all_entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+    return entry
+
+
+def hero_image_html(image_src: str, alt: str, root: Path = ROOT) -> str:
+    """<img>- tai <picture>-merkintä kuvituskuvalle (srcset, sizes, mitat)."""
+    entry = None
+    if image_src.startswith("/"):
+        entry = optimize_image(root / image_src.lstrip("/"), root)
+
+    # Kuvituskuva on sivun ensimmäinen iso elementti, joten sitä ei ladata laiskasti.
+    attrs = f'src="{image_src}" alt="{alt}" loading="eager" decoding="async" fetchpriority="high"'
+    if not entry:
+        return f"<img {attrs}>"
+    attrs += f' width="{entry["width"]}" height="{entry["height"]}"'
+
+    sources = []
+    for mime in ("image/avif", "image/webp"):
+        srcset = ", ".join(f'{v["src"]} {v["width"]}w' for v in entry["variants"] if v["type"] == mime)
+        if srcset:
+            sources.append(f'<source type="{mime}" srcset="{srcset}" sizes="{HERO_SIZES}">')
+    if not sources:
+        return f"<img {attrs}>"
+    return "<picture>" + "".join(sources) + f"<img {attrs}></picture>"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pakkaa kuvituskuvat WebP/AVIF-muotoon.")
+    parser.add_argument("images", nargs="+", type=Path)
+    args = parser.parse_args()
+    if Image is None:
+        print("VAROITUS: Pillow ei ole asennettu; kirjataan vain mitat.")
+    for image in args.images:
+        entry = optimize_image(image.resolve())
+        if entry is None:
+            print(f"{image}: ei käsitelty")
+            continue
+        total = sum(v["bytes"] for v in entry["variants"])
+        print(f"{image}: {entry['width']}x{entry['height']}, {entry['bytes']} tavua -> "
+              f"{len(entry['variants'])} versiota, yhteensä {total} tavua")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+from pathlib import Path
+
+from build_graph import BuildGraph
+from post_manifest import ROOT, PostManifest
+from site_template import PARTIALS_DIR, load_template
+
+
+# Etusivun ja kategoriasivujen artikkelilistat sivutettuina. Arkistosivut ovat
+# kiinteän kokoisia paloja vanhimmasta alkaen (page/1.html = vanhimmat), joten
+# valmis sivu ei muutu, kun uusia juttuja tulee. Ensimmäinen sivu (index.html,
+# talous.html ...) näyttää uusimman täyden palan ja sen jälkeen tulleet jutut,
+# eli INDEX_PAGE_SIZE ... 2 * INDEX_PAGE_SIZE - 1 riviä arkiston koosta riippumatta.
+# Uusi juttu renderöi ensimmäisen sivun ja, palan täyttyessä, uuden arkistosivun
+# sekä sitä edeltävän sivun "Uudemmat"-linkin.
+
+INDEX_PAGE_SIZE = 30
+ARCHIVE_TEMPLATE = "index-page.html"
+
+LIST_START = "<!-- AI-POST-LIST-START -->"
+LIST_END = "<!-- AI-POST-LIST-END -->"
+
+
+# nimi: (ensimmäinen sivu, arkistosivujen hakemisto, kategoriat, otsikko)
+INDEXES = {
+    "etusivu": ("index.html", "page", ("talous", "yhteiskunta", "identiteetti", "villi"), "Kaikki kirjoitukset"),
+    "talous": ("talous.html", "talous/page", ("talous",), "Talous"),
+    "ruoka": ("ruoka.html", "ruoka/page", ("ruoka",), "Ruoka"),
+    "yhteiskunta": ("yhteiskunta.html", "yhteiskunta/page", ("yhteiskunta",), "Yhteiskunta"),
+    "teema": ("teema.html", "teema/page", ("teema",), "Teema"),
+}
+
+
+def index_posts(manifest: PostManifest, categories) -> list[tuple[str, dict]]:
+    """[(polku, metatiedot)] uusin ensin; saman päivän jutut kategorioiden järjestyksessä."""
+    rank = {category: i for i, category in enumerate(categories)}
+    posts = [(key, entry) for key, entry in manifest.posts(set(categories))]
+    posts.sort(key=lambda pair: rank[pair[1]["category"]])
+    posts.sort(key=lambda pair: pair[1]["date"], reverse=True)
+    return posts
+
+
+def paginate(posts: list, size: int = INDEX_PAGE_SIZE) -> tuple[list, list[list]]:
+    """(ensimmäinen sivu, [arkistosivu 1, 2, ...]); kaikki uusin ensin."""
+    oldest_first = posts[::-1]
+    full = len(oldest_first) // size
+    if full <= 1:
+        return posts, []
+    chunks = [oldest_first[i * size:(i + 1) * size][::-1] for i in range(full - 1)]
+    return oldest_first[(full - 1) * size:][::-1], chunks
+
+
+def page_url(directory: str, number: int) -> str:
+    return f"/{directory}/{number}.html"
+
+
+def first_page_url(first_page: str) -> str:
+    return "/" if first_page == "index.html" else f"/{first_page}"
+
+
+def render_items(posts, indent: str = "        ") -> str:
+    return "\n".join(f'{indent}<li><a href="/{key}">{entry["title"]}</a></li>' for key, entry in posts)
+
+
+def render_pager(newer: str = "", older: str = "", indent: str = "      ") -> str:
+    links = []
+    if newer:
+        links.append(f'<a href="{newer}" rel="prev">← Uudemmat</a>')
+    if older:
+        links.append(f'<a href="{older}" rel="next">Vanhemmat →</a>')
+    if not links:
+        return ""
+    return f'{indent}<nav class="pager">{" ".join(links)}</nav>'
+
+
+def render_list_block(posts, older: str = "") -> str:
+    """Ensimmäisen sivun lista merkkien välissä; sivunvaihto listan alle."""
+    lines = ['      <ul class="post-list">', render_items(posts), "      </ul>"]
+    pager = render_pager(older=older)
+    if pager:
+        lines.append(pager)
+    return "\n".join(lines)
+
+
+def patch_list(html_text: str, block: str) -> str | None:
+    """Vaihda sivun artikkelilista. Merkitsemätön <ul class="post-list"> korvataan merkkeineen."""
+    start = html_text.find(LIST_START)
+    end = html_text.find(LIST_END)
+    if start != -1 and end > start:
+        return html_text[:start + len(LIST_START)] + "\n" + block + "\n      " + html_text[end:]
+
+    start = html_text.find('<ul class="post-list">')
+    end = html_text.find("</ul>", start)
+    if start == -1 or end == -1:
+        return None
+    return html_text[:start] + LIST_START + "\n" + block + "\n      " + LIST_END + html_text[end + len("</ul>"):]
+
+
+def render_archive_page(title: str, number: int, posts, newer: str, older: str) -> str:
+    span = f"{posts[-1][1]['date']} – {posts[0][1]['date']}"
+    return load_template(ARCHIVE_TEMPLATE).render(
+        title=title,
+        page=str(number),
+        span=span,
+        items=render_items(posts, indent="          "),
+        pager=render_pager(newer, older, indent="        "),
+    ) + "\n"
+
+
+def archive_template_sources() -> list[Path]:
+    return [PARTIALS_DIR / name for name in load_template(ARCHIVE_TEMPLATE).sources]
+
+
+def build_index(graph: BuildGraph, manifest: PostManifest, name: str, extra_inputs=None, after_patch=None) -> None:
+    """Yhden listan sivut graafin kohteina. after_patch(html) voi muokata ensimmäistä sivua lisää."""
+    first_page, directory, categories, title = INDEXES[name]
+    first_path = ROOT / first_page
+    first, chunks = paginate(index_posts(manifest, categories))
+    recipe = {"scripts/index_pages.py": graph.file(Path(__file__))}
+
+    archive_dir = ROOT / directory
+    template_inputs = graph.files(archive_template_sources())
+    for number, posts in enumerate(chunks, start=1):
+        page_path = archive_dir / f"{number}.html"
+        newer = page_url(directory, number + 1) if number < len(chunks) else first_page_url(first_page)
+        older = page_url(directory, number - 1) if number > 1 else ""
+
+        def render(page_path=page_path, number=number, posts=posts, newer=newer, older=older) -> None:
+            page_path.parent.mkdir(parents=True, exist_ok=True)
+            page_path.write_text(render_archive_page(title, number, posts, newer, older), encoding="utf-8")
+
+        graph.build(
+            f"{directory}/{number}.html",
+            lambda posts=posts, newer=newer, older=older: {
+                **{key: entry["title"] for key, entry in posts},
+                "uudemmat": newer, "vanhemmat": older, **template_inputs, **recipe,
+            },
+            render,
+            outputs=[page_path],
+        )
+
+    # Jos juttuja on poistettu, ylimääräiset arkistosivut poistetaan.
+    if archive_dir.exists():
+        for stale in archive_dir.glob("*.html"):
+            if not stale.stem.isdigit() or int(stale.stem) > len(chunks):
+                stale.unlink()
+                graph.forget(f"{directory}/{stale.name}")
+
+    if not first_path.exists():
+        print(f"VAROITUS: sivua {first_page} ei löytynyt, listaa ei päivitetty.")
+        return
+    older = page_url(directory, len(chunks)) if chunks else ""
+
+    def patch_first_page() -> None:
+        html_text = patch_list(first_path.read_text(encoding="utf-8"), render_list_block(first, older))
+        if html_text is None:
+            print(f"VAROITUS: {first_page}: <ul class=\"post-list\"> -listaa ei löytynyt.")
+            return
+        if after_patch:
+            html_text = after_patch(html_text)
+        first_path.write_text(html_text, encoding="utf-8")
+
+    graph.build(
+        first_page,
+        lambda: {
+            first_page: graph.file(first_path),
+            **{key: entry["title"] for key, entry in first},
+            "vanhemmat": older, **recipe, **(extra_inputs() if extra_inputs else {}),
+        },
+        patch_first_page,
+    )
@@ -0,0 +1,158 @@
+from array import array
+from datetime import date, timedelta
+import hashlib
+import random
+import re
+import sqlite3
+import unicodedata
+
+
+# Saman uutistoimistojutun (Reuters/AP/AFP) kopiot eri lähteissä tunnistetaan
+# MinHash-allekirjoituksilla. LSH-kaistoilla (BANDS kaistaa, ROWS riviä) haetaan
+# ehdokkaat indeksistä, joten uutta uutista ei verrata koko historiaan.
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+
+# Arvioidun Jaccard-samankaltaisuuden raja, jonka ylittävät ovat samaa juttua.
+DUPLICATE_THRESHOLD = 0.6
+# Kopioiksi tulkitaan vain uutiset, joiden julkaisupäivät ovat lähellä toisiaan.
+DUPLICATE_MAX_DAYS = 3
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(20251201)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)
+]
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def shingles(text: str) -> set[int]:
+    """Normalisoidun tekstin sanakolmikot 64-bittisinä tiivisteinä."""
+    decomposed = unicodedata.normalize("NFKD", (text or "").casefold())
+    plain = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    words = re.findall(r"\w+", plain)
+    if len(words) < SHINGLE_WORDS:
+        return {_hash64(w.encode("utf-8")) for w in words}
+    return {
+        _hash64(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def minhash(text: str) -> array:
+    values = shingles(text)
+    sig = array("Q", [_MERSENNE] * NUM_PERM)
+    if not values:
+        return sig
+    for i, (a, b) in enumerate(_PERMUTATIONS):
+        sig[i] = min((a * v + b) % _MERSENNE for v in values)
+    return sig
+
+
+def is_empty(sig: array) -> bool:
+    """Tekstittömän uutisen allekirjoitus (kaikki arvot _MERSENNE) ei kerro sisällöstä mitään."""
+    return sig[0] == _MERSENNE
+
+
+def band_buckets(sig: array) -> list[int]:
+    """Kaistakohtaiset bucket-avaimet (etumerkillisiä, jotta mahtuvat SQLiten INTEGERiin)."""
+    out = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS:(band + 1) * ROWS].tobytes()
+        out.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True))
+    return out
+
+
+def similarity(a: array, b: array) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def _signature_text(row: sqlite3.Row) -> str:
+    text = row["text"]
+    if isinstance(text, str) and text:
+        return text
+    return row["title"] or ""
+
+
+def _close_dates(a: str, b: str) -> bool:
+    try:
+        return abs(date.fromisoformat(a) - date.fromisoformat(b)) <= timedelta(days=DUPLICATE_MAX_DAYS)
+    except (TypeError, ValueError):
+        return False
+
+
+def assign_clusters(conn: sqlite3.Connection) -> tuple[int, int]:
+    """Laske allekirjoitus uutisille, joilla sitä ei vielä ole, ja liitä ne klustereihin.
+
+    Klusterin tunnus on sen ensimmäisen uutisen id; jos uusi uutinen vastaa
+    useaa klusteria, ne yhdistetään. Palauttaa
+    (allekirjoitettujen määrä, kopioksi tunnistettujen määrä).
+    """
+    rows = conn.execute(
+        "SELECT items.id, items.title, items.text, items.published FROM items "
+        "LEFT JOIN item_signatures s ON s.item_id = items.id "
+        "WHERE s.item_id IS NULL ORDER BY items.id"
+    ).fetchall()
+
+    duplicates = 0
+    with conn:
+        for row in rows:
+            sig = minhash(_signature_text(row))
+            if is_empty(sig):
+                # Oma klusteri eikä LSH-kaistoja: muuten kaikki tekstittömät
+                # uutiset olisivat toistensa kopioita (samankaltaisuus 1.0).
+                conn.execute(
+                    "INSERT INTO item_signatures (item_id, signature, cluster_id) VALUES (?, ?, ?)",
+                    (row["id"], sig.tobytes(), row["id"]),
+                )
+                continue
+            buckets = band_buckets(sig)
+
+            candidates = conn.execute(
+                "SELECT DISTINCT s.item_id, s.signature, s.cluster_id, items.published "
+                "FROM lsh_buckets b "
+                "JOIN item_signatures s ON s.item_id = b.item_id "
+                "JOIN items ON items.id = s.item_id "
+                f"WHERE {' OR '.join('(b.band = ? AND b.bucket = ?)' for _ in buckets)}",
+                [v for pair in enumerate(buckets) for v in pair],
+            ).fetchall()
+            matched = {
+                cand["cluster_id"]
+                for cand in candidates
+                if _close_dates(row["published"], cand["published"])
+                and similarity(sig, array("Q", cand["signature"])) >= DUPLICATE_THRESHOLD
+            }
+            cluster_id = min(matched | {row["id"]})
+            if matched:
+                duplicates += 1
+            # Uutinen voi yhdistää kaksi aiemmin erillistä klusteria: ne liitetään pienimpään tunnukseen.
+            merged = sorted(matched - {cluster_id})
+            if merged:
+                conn.execute(
+                    f"UPDATE item_signatures SET cluster_id = ? WHERE cluster_id IN ({', '.join('?' for _ in merged)})",
+                    [cluster_id, *merged],
+                )
+
+            conn.execute(
+                "INSERT INTO item_signatures (item_id, signature, cluster_id) VALUES (?, ?, ?)",
+                (row["id"], sig.tobytes(), cluster_id),
+            )
+            conn.executemany(
+                "INSERT INTO lsh_buckets (band, bucket, item_id) VALUES (?, ?, ?)",
+                [(band, bucket, row["id"]) for band, bucket in enumerate(buckets)],
+            )
+
+    return len(rows), duplicates
+
+
+def forget_removed(conn: sqlite3.Connection) -> None:
+    """Siivoa poistettujen uutisten allekirjoitukset (säilytysajan jälkeen)."""
+    with conn:
+        conn.execute("DELETE FROM item_signatures WHERE item_id NOT IN (SELECT id FROM items)")
+        conn.execute("DELETE FROM lsh_buckets WHERE item_id NOT IN (SELECT id FROM items)")
@@ -0,0 +1,229 @@
+from pathlib import Path
+import json
+import sqlite3
+
+
+# Uutishistorian SQLite-tallennus. Linkille on uniikki indeksi (duplikaattien
+# tarkistus), ja published/source/lang-sarakkeille tavalliset indeksit, joten
+# 7 päivän ikkuna ja vuosiarkistot ovat indeksihakuja eivätkä koko historian läpikäyntejä.
+
+# AUTOINCREMENT: poistetun rivin id:tä ei koskaan käytetä uudelleen, joten
+# (määrä, id-summa, suurin id) -sormenjäljet muuttuvat aina, kun joukko muuttuu.
+ITEMS_TABLE = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    link TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL DEFAULT '',
+    lang TEXT NOT NULL DEFAULT '',
+    published TEXT NOT NULL DEFAULT '',
+    text TEXT NOT NULL DEFAULT '',
+    matches TEXT NOT NULL DEFAULT '[]'
+);
+"""
+
+SCHEMA = ITEMS_TABLE + """
+CREATE UNIQUE INDEX IF NOT EXISTS items_link ON items(link);
+CREATE INDEX IF NOT EXISTS items_published ON items(published);
+CREATE INDEX IF NOT EXISTS items_source ON items(source);
+CREATE INDEX IF NOT EXISTS items_lang ON items(lang);
+
+-- Lähellä toisiaan olevien kopioiden tunnistus (news_dedupe.py)
+CREATE TABLE IF NOT EXISTS item_signatures (
+    item_id INTEGER PRIMARY KEY,
+    signature BLOB NOT NULL,
+    cluster_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS item_signatures_cluster ON item_signatures(cluster_id);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    item_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lsh_buckets_band ON lsh_buckets(band, bucket);
+"""
+
+ITEM_COLUMNS = ("title", "link", "source", "lang", "published", "text", "matches")
+
+# Sama järjestys kuin vanhassa JSON-historiassa: uusin päivä ensin, saman päivän
+# sisällä lisäysjärjestyksessä (vastaa vakaata lajittelua published-kentän mukaan).
+ORDER_BY = "ORDER BY published DESC, id ASC"
+
+# Rivin mukana tulee klusterin tunnus, jos allekirjoitus on jo laskettu.
+ITEM_SELECT = (
+    "SELECT items.*, s.cluster_id AS cluster FROM items "
+    "LEFT JOIN item_signatures s ON s.item_id = items.id"
+)
+
+
+def _migrate_autoincrement(conn: sqlite3.Connection) -> None:
+    """Vanha items-taulu (id INTEGER PRIMARY KEY) kopioidaan AUTOINCREMENT-tauluun.
+
+    id:t säilyvät, joten item_signatures-viittaukset pysyvät ennallaan; indeksit
+    luodaan uudelleen SCHEMAsta.
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'items'").fetchone()
+    if row is None or "AUTOINCREMENT" in row[0].upper():
+        return
+    columns = ", ".join(("id",) + ITEM_COLUMNS)
+    conn.executescript(
+        "BEGIN;"
+        "ALTER TABLE items RENAME TO items_old;"
+        + ITEMS_TABLE
+        + f"INSERT INTO items ({columns}) SELECT {columns} FROM items_old;"
+        "DROP TABLE items_old;"
+        "COMMIT;"
+    )
+
+
+def open_store(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    _migrate_autoincrement(conn)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def row_to_item(row: sqlite3.Row) -> dict:
+    item = {col: row[col] for col in ITEM_COLUMNS}
+    if "cluster" in row.keys() and row["cluster"] is not None:
+        item["cluster"] = row["cluster"]
+    try:
+        item["matches"] = json.loads(item["matches"] or "[]")
+    except ValueError:
+        item["matches"] = []
+    return item
+
+
+def count_items(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+
+def has_link(conn: sqlite3.Connection, link: str) -> bool:
+    return conn.execute("SELECT 1 FROM items WHERE link = ?", (link,)).fetchone() is not None
+
+
+def add_items(conn: sqlite3.Connection, items: list[dict]) -> int:
+    """Lisää uutiset; jo tunnetut linkit ohitetaan. Palauttaa lisättyjen määrän."""
+    before = conn.total_changes
+    with conn:
+        conn.executemany(
+            f"INSERT OR IGNORE INTO items ({', '.join(ITEM_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in ITEM_COLUMNS)})",
+            [
+                (
+                    item.get("title", ""),
+                    item["link"],
+                    item.get("source", ""),
+                    item.get("lang", ""),
+                    item.get("published", ""),
+                    item.get("text", "") or "",
+                    json.dumps(item.get("matches") or [], ensure_ascii=False),
+                )
+                for item in items
+                if isinstance(item, dict) and item.get("link")
+            ],
+        )
+    return conn.total_changes - before
+
+
+def export_history(conn: sqlite3.Connection) -> dict:
+    """Koko historia JSON-muodossa id-järjestyksessä (uudet rivit tiedoston loppuun).
+
+    id:t ja AUTOINCREMENT-laskuri (last_id) kulkevat mukana, jotta kannasta
+    JSONista uudelleen rakennettuna tulee sama kuin ennen.
+    """
+    rows = conn.execute(f"SELECT id, {', '.join(ITEM_COLUMNS)} FROM items ORDER BY id")
+    items = [{"id": r["id"], **row_to_item(r)} for r in rows]
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'items'").fetchone()
+    return {"last_id": seq[0] if seq else 0, "items": items}
+
+
+def import_history(conn: sqlite3.Connection, history: dict) -> int:
+    """Rakenna tyhjä kanta export_historyn tuottamasta (tai vanhasta id:ttömästä) JSONista.
+
+    Palauttaa lisättyjen määrän.
+    """
+    columns = ("id",) + ITEM_COLUMNS
+    before = conn.total_changes
+    with conn:
+        conn.executemany(
+            f"INSERT OR IGNORE INTO items ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [
+                (
+                    item["id"] if isinstance(item.get("id"), int) else None,
+                    item.get("title", ""),
+                    item["link"],
+                    item.get("source", ""),
+                    item.get("lang", ""),
+                    item.get("published", ""),
+                    item.get("text", "") or "",
+                    json.dumps(item.get("matches") or [], ensure_ascii=False),
+                )
+                for item in history.get("items", [])
+                if isinstance(item, dict) and item.get("link")
+            ],
+        )
+        added = conn.total_changes - before
+        # Poistettujen rivien id:itä ei käytetä uudelleen tuonnin jälkeenkään.
+        last_id = history.get("last_id")
+        if isinstance(last_id, int) and last_id > 0:
+            if conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'items'").fetchone():
+                conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'items'", (last_id,))
+            else:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('items', ?)", (last_id,))
+    return added
+
+
+def all_items(conn: sqlite3.Connection) -> list[dict]:
+    return [row_to_item(r) for r in conn.execute(f"{ITEM_SELECT} {ORDER_BY}")]
+
+
+def items_since(conn: sqlite3.Connection, since_iso: str) -> list[dict]:
+    """Uutiset, joiden published >= since_iso (YYYY-MM-DD)."""
+    rows = conn.execute(f"{ITEM_SELECT} WHERE published >= ? {ORDER_BY}", (since_iso,))
+    return [row_to_item(r) for r in rows]
+
+
+def items_for_year(conn: sqlite3.Connection, year: str) -> list[dict]:
+    rows = conn.execute(
+        f"{ITEM_SELECT} WHERE published >= ? AND published < ? {ORDER_BY}",
+        (f"{year}-", f"{int(year) + 1}-"),
+    )
+    return [row_to_item(r) for r in rows]
+
+
+def year_summaries(conn: sqlite3.Connection) -> list[tuple[str, int, str]]:
+    """[(vuosi, uutisten määrä, sormenjälki)] uusin vuosi ensin.
+
+    Rivejä ei koskaan muokata, vain lisätään tai poistetaan, eikä poistettua
+    id:tä käytetä uudelleen (AUTOINCREMENT), joten (määrä, id-summa, suurin id)
+    muuttuu aina, kun vuoden uutisjoukko muuttuu.
+    """
+    rows = conn.execute(
+        "SELECT substr(published, 1, 4) AS year, COUNT(*), SUM(id), MAX(id) FROM items "
+        "WHERE length(published) >= 4 GROUP BY year ORDER BY year DESC"
+    )
+    return [(r[0], r[1], f"{r[1]}-{r[2]}-{r[3]}") for r in rows if r[0].isdigit()]
+
+
+def window_fingerprint(conn: sqlite3.Connection, since_iso: str) -> str:
+    """Aikaikkunan (published >= since_iso) uutisjoukon ja klusterien sormenjälki."""
+    row = conn.execute(
+        "SELECT COUNT(*), SUM(items.id), MAX(items.id), TOTAL(s.cluster_id) FROM items "
+        "LEFT JOIN item_signatures s ON s.item_id = items.id WHERE published >= ?",
+        (since_iso,),
+    ).fetchone()
+    return f"{row[0]}-{row[1]}-{row[2]}-{row[3]:.0f}"
+
+
+def apply_retention(conn: sqlite3.Connection, keep_days: int | None, today_iso: str) -> int:
+    """Poista uutiset, jotka ovat keep_days päivää vanhempia. None = säilytä kaikki."""
+    if keep_days is None:
+        return 0
+    with conn:
+        cur = conn.execute(
+            "DELETE FROM items WHERE published < date(?, ?)",
+            (today_iso, f"-{int(keep_days)} days"),
+        )
+    return cur.rowcount
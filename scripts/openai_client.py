@@ -0,0 +1,446 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import base64
+import functools
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from response_cache import ResponseCache
+
+
+# Yhteinen HTTP-asiakas OpenAI-kutsuille: yksi requests.Session (yhteyspooli ja
+# keep-alive), uudelleenyritykset satunnaistetulla eksponentiaalisella
+# viiveellä (429, 5xx, aikakatkaisut), Retry-After- ja (429:lle) x-ratelimit-reset-*
+# -otsakkeiden noudattaminen sekä yläraja samanaikaisille pyynnöille.
+# stream_chat lukee chat completionin SSE-virtana ja voi katkaista sen kesken.
+#
+# Paikallinen korvike testaukseen ilman verkkoa tai API-avainta:
+#
+#   python scripts/openai_client.py serve --error-rate 0.3 --token-ms 5 --malformed-rate 0.3
+#   OPENAI_BASE_URL=http://127.0.0.1:8788/v1 OPENAI_API_KEY=x python scripts/generate_post.py
+
+API_BASE = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+
+MAX_IN_FLIGHT = int(os.environ.get("OPENAI_MAX_IN_FLIGHT", "4"))
+MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "5"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# Pidempää palvelimen pyytämää taukoa ei odoteta, vaan ajo epäonnistuu.
+MAX_RETRY_AFTER = 300.0
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+# Virheet, joiden jälkeen pyyntö yritetään uudelleen (myös kesken vastausrungon).
+RETRY_EXCEPTIONS = (
+    requests.Timeout,
+    requests.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class OpenAIError(RuntimeError):
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+class StructureError(ValueError):
+    """Virtaava vastaus ei noudata odotettua rakennetta; generointi katkaistaan."""
+
+
+def _read_json(resp: requests.Response) -> dict:
+    try:
+        return resp.json()
+    except ValueError as e:
+        raise OpenAIError(f"OpenAI API: vastaus ei ole JSONia: {resp.text[:500]}", 200) from e
+
+
+def _read_chat_stream(resp: requests.Response, check=None) -> dict:
+    """Kokoa chat completion -vastaus SSE-riveistä ("data: {...}", "data: [DONE]")."""
+    started = time.perf_counter()
+    first_token_at = None
+    content = ""
+    chunks = 0
+    usage = None
+    finish_reason = None
+
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+        if event.get("usage"):
+            usage = event["usage"]
+        for choice in event.get("choices") or []:
+            finish_reason = choice.get("finish_reason") or finish_reason
+            delta = (choice.get("delta") or {}).get("content")
+            if not delta:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            content += delta
+            chunks += 1
+            if check is not None:
+                check(content, False)
+
+    if check is not None:
+        check(content, True)
+
+    elapsed = time.perf_counter() - started
+    ttft = (first_token_at or time.perf_counter()) - started
+    completion_tokens = (usage or {}).get("completion_tokens") or chunks
+    generating = elapsed - ttft
+    return {
+        "choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+        "usage": usage,
+        "timing": {
+            "ttft_s": round(ttft, 3),
+            "total_s": round(elapsed, 3),
+            "completion_tokens": completion_tokens,
+            "tokens_per_s": round(completion_tokens / generating, 1) if generating > 0 else 0.0,
+        },
+    }
+
+
+def parse_retry_after(value: str | None, now: datetime | None = None) -> float | None:
+    """Retry-After sekunteina: joko luku tai HTTP-päiväys."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+def parse_reset(value: str | None) -> float | None:
+    """x-ratelimit-reset-* ("1s", "6m0s", "250ms") sekunteina."""
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value.strip())
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def retry_delay(resp: requests.Response | None, attempt: int, rng: random.Random) -> float:
+    """Palvelimen pyytämä tauko, muuten täysi satunnaistus (full jitter) 2^attempt-ikkunasta.
+
+    Retry-After koskee kaikkia tiloja; x-ratelimit-reset-* vain 429-vastausta,
+    koska ne kertovat kiintiön nollautumisen eivätkä sitä, milloin 5xx-vika on ohi.
+    """
+    if resp is not None:
+        delays = [parse_retry_after(resp.headers.get("Retry-After"))]
+        if resp.status_code == 429:
+            delays += [
+                parse_reset(resp.headers.get("x-ratelimit-reset-requests")),
+                parse_reset(resp.headers.get("x-ratelimit-reset-tokens")),
+            ]
+        for delay in delays:
+            if delay is not None:
+                return delay
+    return rng.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class OpenAIClient:
+    """Säieturvallinen asiakas; kaikki säikeet jakavat yhteyspoolin ja rajoittimen."""
+
+    def __init__(self, api_key: str, base_url: str = API_BASE, max_in_flight: int = MAX_IN_FLIGHT,
+                 max_retries: int = MAX_RETRIES, seed: int | None = None,
+                 cache: ResponseCache | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_in_flight))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        # Rajoitusvastauksen jälkeen kaikki säikeet odottavat tähän hetkeen asti.
+        self._paused_until = 0.0
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0}
+
+    def _wait_for_pause(self) -> None:
+        with self._lock:
+            delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pause(self, delay: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def post(self, path: str, payload: dict, timeout: float, cache_tag: str = "") -> dict:
+        """cache_tag lisätään välimuistin avaimeen (ei lähetetä API:lle)."""
+        if self.cache is not None:
+            cached = self.cache.get(path, payload, cache_tag)
+            if cached is not None:
+                return cached
+        data = self._request(path, payload, timeout, _read_json)
+        if self.cache is not None:
+            self.cache.put(path, payload, data, cache_tag)
+        return data
+
+    def stream_chat(self, payload: dict, timeout: float, check=None) -> dict:
+        """Chat completion SSE-virtana.
+
+        check(teksti, valmis) kutsutaan jokaisen palan jälkeen ja lopuksi
+        valmis=True; jos se nostaa StructureError-poikkeuksen, virta katkaistaan
+        heti eikä loppua odoteta. Palauttaa tavallisen vastauksen muotoisen
+        sanakirjan, johon lisätään "timing" (ttft_s, tokens_per_s, ...).
+        """
+        payload = dict(payload, stream=True, stream_options={"include_usage": True})
+        if self.cache is not None:
+            cached = self.cache.get("chat/completions", payload)
+            if cached is not None:
+                return cached
+
+        def consume(resp: requests.Response) -> dict:
+            return _read_chat_stream(resp, check)
+
+        data = self._request("chat/completions", payload, timeout, consume)
+        timing = data["timing"]
+        print(f"OpenAI {payload.get('model')}: ensimmäinen token {timing['ttft_s']:.2f} s, "
+              f"{timing['completion_tokens']} tokenia, {timing['tokens_per_s']:.1f} tokenia/s")
+        if self.cache is not None:
+            self.cache.put("chat/completions", payload, data)
+        return data
+
+    def _request(self, path: str, payload: dict, timeout: float, consume):
+        """Lähetä pyyntö uudelleenyrityksin; consume(resp) lukee 200-vastauksen rungon paikan sisällä."""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        attempt = 0
+        while True:
+            self._wait_for_pause()
+            resp = None
+            error = None
+            with self._slots:
+                with self._lock:
+                    self.stats["requests"] += 1
+                try:
+                    resp = self.session.post(url, json=payload, timeout=timeout, stream=True)
+                    if resp.status_code == 200:
+                        if resp.headers.get("x-ratelimit-remaining-requests") == "0":
+                            delay = parse_reset(resp.headers.get("x-ratelimit-reset-requests"))
+                            if delay:
+                                self._pause(delay)
+                        with resp:
+                            return consume(resp)
+                    resp.content  # luetaan runko virheilmoitusta varten ja vapautetaan yhteys
+                except RETRY_EXCEPTIONS as e:
+                    error = e
+
+            retryable = error is not None or resp.status_code in RETRY_STATUSES
+            if not retryable or attempt >= self.max_retries:
+                if error is not None:
+                    raise OpenAIError(f"OpenAI API: {type(error).__name__}: {error}") from error
+                raise OpenAIError(f"OpenAI API error: {resp.status_code} {resp.text}", resp.status_code)
+
+            with self._lock:
+                delay = retry_delay(resp if error is None else None, attempt, self._rng)
+                self.stats["retries"] += 1
+            if delay > MAX_RETRY_AFTER:
+                raise OpenAIError(
+                    f"OpenAI API: palvelin pyysi {delay:.0f} s tauon: {resp.status_code}",
+                    resp.status_code,
+                )
+            if error is None and resp.status_code == 429:
+                with self._lock:
+                    self.stats["throttled"] += 1
+                self._pause(delay)
+            reason = type(error).__name__ if error is not None else resp.status_code
+            print(f"VAROITUS: OpenAI {path}: {reason}, uusi yritys {attempt + 1}/{self.max_retries} "
+                  f"{delay:.1f} s kuluttua")
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# --- paikallinen korvike ---
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+@functools.lru_cache(maxsize=None)
+def _stub_png(size: int = 1024) -> str:
+    """Kuvarajapinnan vastaus: size x size -liukuväri-PNG (kuten gpt-image-1) base64-muodossa."""
+    xs = bytes(x * 255 // size for x in range(size))
+    rows = []
+    for y in range(size):
+        shade = y * 255 // size
+        row = bytearray(3 * size)
+        row[0::3] = xs
+        row[1::3] = bytes([shade]) * size
+        row[2::3] = bytes([128]) * size
+        rows.append(b"\x00" + bytes(row))
+    png = (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+        + _png_chunk(b"IDAT", zlib.compress(b"".join(rows), 6))
+        + _png_chunk(b"IEND", b"")
+    )
+    return base64.b64encode(png).decode("ascii")
+
+
+def _stub_article(payload: dict, malformed: bool = False) -> str:
+    prompt = payload.get("messages", [{}])[-1].get("content", "")
+    sections = "".join(
+        f"<h2>Väliotsikko {i}</h2>\n<p>{'Korvikepalvelimen tuottamaa leipätekstiä. ' * 20}</p>\n"
+        for i in range(1, 6)
+    )
+    article = (
+        "<h1>Testiartikkeli</h1>\n"
+        f"<p>Korvikepalvelimen vastaus ({len(prompt)} merkin kehotteeseen).</p>\n"
+        f"{sections}"
+    )
+    if malformed:
+        return f"<html><body>\n{article}</body></html>\n"
+    return article
+
+
+def make_stub_handler(error_rate: float, retry_after: float, latency_ms: float, rng: random.Random,
+                      token_ms: float = 0, malformed_rate: float = 0.0):
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler API
+            pass
+
+        def _send_json(self, status: int, body: dict, headers: dict | None = None) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, text: str, prompt_tokens: int) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            tokens = re.findall(r"\s*\S+", text)
+            try:
+                for token in tokens:
+                    event = {"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if token_ms:
+                        time.sleep(token_ms / 1000)
+                done = {"choices": [], "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens)}}
+                self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # asiakas katkaisi virran
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": {"message": "invalid JSON"}})
+                return
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            with lock:
+                roll = rng.random()
+            if roll < error_rate / 2:
+                self._send_json(429, {"error": {"message": "rate limited"}},
+                                {"Retry-After": f"{retry_after:g}"})
+                return
+            if roll < error_rate:
+                self._send_json(503, {"error": {"message": "unavailable"}})
+                return
+
+            if self.path.endswith("/chat/completions"):
+                with lock:
+                    malformed = rng.random() < malformed_rate
+                if payload.get("stream"):
+                    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in payload.get("messages", []))
+                    self._send_stream(_stub_article(payload, malformed), prompt_tokens)
+                    return
+                self._send_json(200, {"choices": [{"message": {"role": "assistant",
+                                                               "content": _stub_article(payload, malformed)}}]})
+            elif "/images" in self.path:
+                self._send_json(200, {"data": [{"b64_json": _stub_png()}]})
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+    return StubHandler
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, error_rate: float = 0.0,
+                      retry_after: float = 0.1, latency_ms: float = 0, token_ms: float = 0,
+                      malformed_rate: float = 0.0, seed: int = 1) -> ThreadingHTTPServer:
+    handler = make_stub_handler(error_rate, retry_after, latency_ms, random.Random(seed), token_ms, malformed_rate)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-rajapinnan paikallinen korvike.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="käynnistä korvikepalvelin")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8788)
+    p_serve.add_argument("--error-rate", type=float, default=0.0, help="osuus vastauksista, jotka ovat 429/503")
+    p_serve.add_argument("--retry-after", type=float, default=0.1, help="429-vastausten Retry-After sekunteina")
+    p_serve.add_argument("--latency-ms", type=float, default=0, help="viive jokaiseen vastaukseen")
+    p_serve.add_argument("--token-ms", type=float, default=0, help="viive jokaisen virtaavan tokenin jälkeen")
+    p_serve.add_argument("--malformed-rate", type=float, default=0.0,
+                         help="osuus artikkeleista, jotka kääritään <html>-tageihin")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.host, args.port, args.error_rate, args.retry_after, args.latency_ms,
+                               args.token_ms, args.malformed_rate)
+    print(f"Korvikepalvelin: http://{args.host}:{server.server_address[1]}/v1 (OPENAI_BASE_URL tähän osoitteeseen)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+from datetime import date
+from pathlib import Path
+import argparse
+import hashlib
+import html
+import json
+import re
+import threading
+
+
+# Artikkelien metatiedot (polku, kategoria, päivä, otsikko, tiivistelmä,
+# sisällön tiiviste, koko) tiedostossa data/post_manifest.json. Kaikki posts/-puuta lukevat
+# funktiot kysyvät manifestilta, joten ajon levy-I/O kasvaa uusien
+# artikkelien eikä koko arkiston mukana.
+#
+#   python scripts/post_manifest.py --rebuild
+
+ROOT = Path(__file__).resolve().parents[1]
+POSTS_DIR = ROOT / "posts"
+MANIFEST_PATH = ROOT / "data" / "post_manifest.json"
+
+DEFAULT_TITLE = "AISuomi – artikkeli"
+
+# Tiivistelmä (syötteiden kuvaus) on leipätekstin ensimmäinen kappale lyhennettynä.
+SUMMARY_MAX_CHARS = 280
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _find_between(doc_html: str, open_tag: str, close_tag: str) -> str | None:
+    start = doc_html.find(open_tag)
+    if start == -1:
+        return None
+    end = doc_html.find(close_tag, start + len(open_tag))
+    if end == -1:
+        return None
+    return doc_html[start + len(open_tag):end].strip()
+
+
+def extract_title(doc_html: str) -> str:
+    title = _find_between(doc_html, "<title>", "</title>")
+    if title is None:
+        title = _find_between(doc_html, "<h1>", "</h1>")
+    return DEFAULT_TITLE if title is None else title
+
+
+def extract_summary(doc_html: str, max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """Pääsarakkeen ensimmäinen kappale pelkkänä tekstinä, enintään max_chars merkkiä."""
+    start = doc_html.find('class="main-column"')
+    paragraph = _find_between(doc_html[start:] if start != -1 else doc_html, "<p>", "</p>")
+    if not paragraph:
+        return ""
+    text = " ".join(html.unescape(_TAG_RE.sub("", paragraph)).split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0].rstrip(",.;:") + "…"
+
+
+def post_category(path: Path, posts_dir: Path = POSTS_DIR) -> str:
+    """posts/<kind>/... -> kind; vanhat posts/YYYY-MM-DD-<kind>.html -> kind."""
+    relative = path.relative_to(posts_dir)
+    if len(relative.parts) > 1:
+        return relative.parts[0]
+    return path.stem[11:] if len(path.stem) > 11 else path.stem
+
+
+def post_date(path: Path) -> str | None:
+    try:
+        return date.fromisoformat(path.name[:10]).isoformat()
+    except ValueError:
+        return None
+
+
+def describe_post(path: Path, root: Path = ROOT, posts_dir: Path = POSTS_DIR) -> dict:
+    data = path.read_bytes()
+    document = data.decode("utf-8", errors="ignore")
+    return {
+        "category": post_category(path, posts_dir),
+        "date": post_date(path),
+        "title": extract_title(document),
+        "summary": extract_summary(document),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "size": len(data),
+    }
+
+
+class PostManifest:
+    """Säieturvallinen {polku: metatiedot} -hakemisto, joka tallennetaan JSONina.
+
+    Päivätyt rivit pidetään uusin ensin -järjestyksessä, joka lajitellaan
+    uudelleen vasta, kun manifesti muuttuu.
+    """
+
+    def __init__(self, path: Path = MANIFEST_PATH, root: Path = ROOT, posts_dir: Path = POSTS_DIR):
+        self.path = path
+        self.root = root
+        self.posts_dir = posts_dir
+        self._posts: dict[str, dict] = {}
+        self._sorted: list[tuple[str, dict]] | None = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path = MANIFEST_PATH, root: Path = ROOT, posts_dir: Path = POSTS_DIR) -> "PostManifest":
+        manifest = cls(path, root, posts_dir)
+        if path.exists():
+            try:
+                with path.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict) and isinstance(data.get("posts"), dict):
+                    manifest._posts = data["posts"]
+            except Exception:
+                manifest._posts = {}
+            manifest._sorted = None
+        manifest.sync()
+        return manifest
+
+    def key(self, path: Path) -> str:
+        return path.relative_to(self.root).as_posix()
+
+    def sync(self) -> int:
+        """Lisää manifestista puuttuvat tiedostot ja poista kadonneet.
+
+        Vain uudet tiedostot ja vanhan manifestin tiivistelmättömät rivit luetaan;
+        olemassa olevien sisältöä ei tarkisteta (siihen on --rebuild).
+        Palauttaa muutettujen rivien määrän.
+        """
+        on_disk = {}
+        if self.posts_dir.exists():
+            on_disk = {self.key(p): p for p in self.posts_dir.rglob("*.html")}
+        changed = 0
+        with self._lock:
+            for key in list(self._posts):
+                if key not in on_disk:
+                    del self._posts[key]
+                    changed += 1
+            for key, p in on_disk.items():
+                if "summary" not in self._posts.get(key, {}):
+                    self._posts[key] = describe_post(p, self.root, self.posts_dir)
+                    changed += 1
+            if changed:
+                self._dirty = True
+                self._sorted = None
+        return changed
+
+    def rebuild(self) -> None:
+        with self._lock:
+            self._posts = {}
+            self._sorted = None
+        self.sync()
+
+    def update(self, path: Path) -> dict:
+        entry = describe_post(path, self.root, self.posts_dir)
+        with self._lock:
+            self._posts[self.key(path)] = entry
+            self._dirty = True
+            self._sorted = None
+        return entry
+
+    def get(self, path: Path) -> dict | None:
+        with self._lock:
+            entry = self._posts.get(self.key(path))
+            return dict(entry) if entry else None
+
+    def posts(self, categories=None, limit: int | None = None) -> list[tuple[str, dict]]:
+        """[(polku, metatiedot)] uusin ensin; päivättömät jätetään pois.
+
+        limit lopettaa läpikäynnin, kun uusimmat limit riviä on löytynyt.
+        """
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = sorted(
+                    ((key, entry) for key, entry in self._posts.items() if entry.get("date")),
+                    key=lambda pair: (pair[1]["date"], pair[0]),
+                    reverse=True,
+                )
+            items = []
+            for key, entry in self._sorted:
+                if limit is not None and len(items) >= limit:
+                    break
+                if categories is None or entry.get("category") in categories:
+                    items.append((key, dict(entry)))
+        return items
+
+    def all_paths(self) -> list[str]:
+        with self._lock:
+            return sorted(self._posts)
+
+    def save(self, force: bool = False) -> bool:
+        with self._lock:
+            if not (self._dirty or force):
+                return False
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("w", encoding="utf-8") as f:
+                json.dump({"posts": self._posts}, f, ensure_ascii=False, indent=1, sort_keys=True)
+            self._dirty = False
+        return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Artikkelimanifestin ylläpito.")
+    parser.add_argument("--rebuild", action="store_true", help="rakenna manifesti uudelleen levyltä")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        manifest = PostManifest()
+        manifest.rebuild()
+    else:
+        manifest = PostManifest.load()
+    manifest.save(force=args.rebuild)
+    print(f"Manifestissa {len(manifest.all_paths())} artikkelia: {manifest.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+from collections import Counter, defaultdict
+from pathlib import Path
+import argparse
+import heapq
+import json
+import math
+import re
+import threading
+import zlib
+
+from post_manifest import MANIFEST_PATH, POSTS_DIR, ROOT, PostManifest
+
+
+# Artikkelien sisältösamankaltaisuus: hajautettu (hashed) bag-of-words,
+# TF-IDF-painot ja kosinisamankaltaisuus. Käänteisindeksin ansiosta kysely
+# käy läpi vain ne artikkelit, joilla on yhteisiä termejä kyselyn kanssa.
+# Termifrekvenssit tallennetaan tiedostoon data/post_index.json; uudet ja
+# muuttuneet artikkelit tunnistetaan manifestin sha256-tiivisteestä.
+#
+#   python scripts/post_similarity.py posts/talous/2026-01-06-talous.html
+
+INDEX_PATH = ROOT / "data" / "post_index.json"
+INDEX_VERSION = 1
+
+# Piirreavaruuden koko (2^20); törmäykset ovat harvinaisia ja harmittomia.
+FEATURES = 1 << 20
+
+# Lyhyet taivutuspäätteet pisimmästä lyhimpään. Kevyt katkaisu riittää
+# samankaltaisuuteen: "asumisen", "asumiseen" ja "asumista" -> "asumis".
+SUFFIXES = sorted(
+    (
+        "issaan", "issään", "iksi", "ksi", "ineen", "iden", "ien", "ssa", "ssä", "sta", "stä",
+        "lla", "llä", "lta", "ltä", "lle", "tta", "ttä", "na", "nä", "en", "an", "än", "in",
+        "ja", "jä", "ta", "tä", "a", "ä", "n", "t", "i",
+    ),
+    key=len,
+    reverse=True,
+)
+# Kysely tehdään vain tekstin painavimmilla termeillä (kuten "more like this"
+# -hauissa). Harvinaisten termien postauslistat ovat lyhyitä, joten kyselyn
+# hinta ei juuri kasva korpuksen mukana.
+QUERY_TERMS = 50
+
+MIN_STEM = 4
+MAX_STEM = 7
+MIN_TOKEN = 3
+
+STOPWORDS = frozenset("""
+aina ehkä ei eikä eli ennen entä esimerkiksi että ettei he hyvin hän ja jo joiden joita
+joka jokainen jolla jonka jos joskus jossa jotka jotta kaikki kanssa kaksi koska kuin kuinka
+kuitenkin kun kuten lisäksi me mikä minä miksi mitä miten moni monet monia mukaan muita
+muut mutta myös ne niiden niin niitä nyt näin nämä ole oli olisi olla ollut on ovat paljon
+se sekä sen sillä siinä siihen siis siitä sitä saattaa sinä tai te tämä tämän tässä tähän
+tällä tätä usein vaan vaikka vain vielä voi voidaan voivat yksi yli
+""".split())
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    return word[:MAX_STEM]
+
+
+def article_text(document: str) -> str:
+    """Artikkelin leipäteksti ilman navigaatiota, jakolinkkejä ja sivupalkkia."""
+    start = document.find('class="main-column"')
+    if start == -1:
+        body = document
+    else:
+        start = document.find(">", start) + 1
+        ends = [i for i in (document.find('<div class="card">', start), document.find("</section>", start)) if i != -1]
+        body = document[start:min(ends)] if ends else document[start:]
+    return _TAG_RE.sub(" ", body)
+
+
+def term_counts(text: str) -> dict[int, int]:
+    """Suomenkielisen tekstin hajautetut termifrekvenssit {piirre: lukumäärä}."""
+    counts: dict[int, int] = {}
+    for word in _WORD_RE.findall(text.casefold()):
+        if len(word) < MIN_TOKEN or word in STOPWORDS:
+            continue
+        feature = zlib.crc32(stem(word).encode("utf-8")) & (FEATURES - 1)
+        counts[feature] = counts.get(feature, 0) + 1
+    return counts
+
+
+class SimilarityIndex:
+    """Säieturvallinen TF-IDF-indeksi; painot lasketaan latauksen yhteydessä."""
+
+    def __init__(self, path: Path = INDEX_PATH):
+        self.path = path
+        self._docs: dict[str, dict] = {}
+        # piirre -> [(polku, normalisoitu tf-idf-paino)]
+        self._postings: dict[int, list[tuple[str, float]]] = {}
+        self._df: dict[int, int] = {}
+        # Latauksen aikaiset idf-arvot; uudet artikkelit eivät muuta muiden painoja.
+        self._idf_cache: dict[int, float] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, manifest: PostManifest, path: Path = INDEX_PATH) -> "SimilarityIndex":
+        index = cls(path)
+        if path.exists():
+            try:
+                with path.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict) and data.get("version") == INDEX_VERSION:
+                    index._docs = data.get("docs", {})
+            except Exception:
+                index._docs = {}
+        index.sync(manifest)
+        return index
+
+    def sync(self, manifest: PostManifest) -> int:
+        """Tuo indeksi manifestin tasolle (uudet, muuttuneet, poistetut) ja laske painot."""
+        wanted = {key: entry["sha256"] for key, entry in manifest.posts()}
+        changed = 0
+        with self._lock:
+            for key in list(self._docs):
+                if key not in wanted:
+                    del self._docs[key]
+                    changed += 1
+            for key, sha in wanted.items():
+                doc = self._docs.get(key)
+                if doc and doc.get("sha256") == sha:
+                    continue
+                try:
+                    document = (manifest.root / key).read_text(encoding="utf-8")
+                except OSError:
+                    continue
+                self._docs[key] = self._encode(sha, term_counts(article_text(document)))
+                changed += 1
+            if changed:
+                self._dirty = True
+            self._rebuild()
+        return changed
+
+    @staticmethod
+    def _encode(sha: str, counts: dict[int, int]) -> dict:
+        features = sorted(counts)
+        return {"sha256": sha, "f": features, "c": [counts[f] for f in features]}
+
+    def _idf(self, feature: int) -> float:
+        idf = self._idf_cache.get(feature)
+        if idf is None:
+            idf = math.log((len(self._docs) + 1) / (self._df.get(feature, 0) + 1)) + 1.0
+        return idf
+
+    def _weights(self, counts: dict[int, int]) -> dict[int, float]:
+        weights = {f: (1.0 + math.log(c)) * self._idf(f) for f, c in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        if not norm:
+            return {}
+        return {f: w / norm for f, w in weights.items()}
+
+    def _rebuild(self) -> None:
+        df = Counter()
+        for doc in self._docs.values():
+            df.update(doc["f"])
+        self._df = dict(df)
+        base = math.log(len(self._docs) + 1)
+        self._idf_cache = {f: base - math.log(n + 1) + 1.0 for f, n in self._df.items()}
+
+        idf = self._idf_cache
+        tf = [0.0] + [1.0 + math.log(c) for c in range(1, 256)]
+        postings: dict[int, list] = defaultdict(list)
+        for key, doc in self._docs.items():
+            features = doc["f"]
+            weights = [(tf[c] if c < 256 else 1.0 + math.log(c)) * idf[f] for f, c in zip(features, doc["c"])]
+            norm = math.sqrt(sum(w * w for w in weights))
+            if not norm:
+                continue
+            for f, w in zip(features, weights):
+                postings[f].append((key, w / norm))
+        self._postings = dict(postings)
+
+    def add(self, key: str, document: str, sha: str) -> None:
+        """Lisää tai päivitä yksi artikkeli; muiden painoja ei lasketa uudelleen."""
+        counts = term_counts(article_text(document))
+        with self._lock:
+            old = self._docs.get(key)
+            if old:
+                for f in old["f"]:
+                    self._df[f] -= 1
+                    self._postings[f] = [pair for pair in self._postings.get(f, []) if pair[0] != key]
+            self._docs[key] = self._encode(sha, counts)
+            for f in counts:
+                self._df[f] = self._df.get(f, 0) + 1
+            for f, w in self._weights(counts).items():
+                self._postings.setdefault(f, []).append((key, w))
+            self._dirty = True
+
+    def query(self, text: str, k: int = 5, exclude=()) -> list[tuple[str, float]]:
+        """k samankaltaisinta artikkelia tekstille: [(polku, kosini)] suurin ensin."""
+        return self.query_counts(term_counts(text), k, exclude)
+
+    def query_counts(self, counts: dict[int, int], k: int = 5, exclude=()) -> list[tuple[str, float]]:
+        exclude = set(exclude)
+        scores: dict[str, float] = {}
+        with self._lock:
+            weights = self._weights(counts)
+            top = heapq.nlargest(QUERY_TERMS, weights.items(), key=lambda pair: pair[1])
+            for f, qw in top:
+                for key, dw in self._postings.get(f, ()):
+                    scores[key] = scores.get(key, 0.0) + qw * dw
+        for key in exclude:
+            scores.pop(key, None)
+        return heapq.nlargest(k, scores.items(), key=lambda pair: (pair[1], pair[0]))
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def save(self, force: bool = False) -> bool:
+        with self._lock:
+            if not (self._dirty or force):
+                return False
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "docs": self._docs}, f, sort_keys=True, separators=(",", ":"))
+            self._dirty = False
+        return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Etsi artikkelia muistuttavat jutut.")
+    parser.add_argument("post", type=Path, help="artikkelin polku")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    manifest = PostManifest.load(MANIFEST_PATH, ROOT, POSTS_DIR)
+    index = SimilarityIndex.load(manifest)
+    index.save()
+    post = args.post.resolve()
+    key = post.relative_to(ROOT).as_posix()
+    document = post.read_text(encoding="utf-8")
+    for other, score in index.query(article_text(document), args.k, exclude={key}):
+        title = (manifest.get(ROOT / other) or {}).get("title", "")
+        print(f"{score:.3f}  {other}  {title}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+# OpenAI-vastausten sisältöosoitteinen levyvälimuisti. Avain on pyynnön
+# (rajapinta, malli, viestit, lämpötila, kuvakoko ...) kanoninen SHA-256, joten
+# uudelleenajo samoilla kehotteilla ei maksa eikä odota samoja generointeja.
+# Hakemisto .cache/openai/ on gitignoressa; workflow säilyttää sen
+# actions/cache-välimuistissa ajojen välillä.
+
+ROOT = Path(__file__).resolve().parents[1]
+CACHE_DIR = ROOT / ".cache" / "openai"
+
+# Tavallisessa ajossa kelpaa vain näin tuore vastaus, ja vanhemmat poistetaan
+# ajon lopussa. --reuse-cache hyväksyy minkä tahansa jäljellä olevan vastauksen.
+CACHE_TTL_HOURS = float(os.environ.get("OPENAI_CACHE_TTL_HOURS", "72"))
+CACHE_MAX_MB = float(os.environ.get("OPENAI_CACHE_MAX_MB", "200"))
+
+
+def cache_key(path: str, payload: dict, tag: str = "") -> str:
+    """tag erottaa vastaukset, joiden pyyntö on sama mutta joita ei saa jakaa (esim. viikon kuva)."""
+    key = {"path": path, "payload": payload}
+    if tag:
+        key["tag"] = tag
+    canonical = json.dumps(key, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Säieturvallinen {avain: vastaus-JSON} -hakemisto TTL- ja kokorajalla."""
+
+    def __init__(self, directory: Path = CACHE_DIR, ttl_hours: float | None = CACHE_TTL_HOURS,
+                 max_bytes: int = int(CACHE_MAX_MB * 1024 * 1024)):
+        self.directory = directory
+        self.ttl = None if ttl_hours is None else ttl_hours * 3600
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, path: str, payload: dict, tag: str = "") -> dict | None:
+        entry_path = self._path(cache_key(path, payload, tag))
+        try:
+            age = time.time() - entry_path.stat().st_mtime
+            if self.ttl is not None and age > self.ttl:
+                raise FileNotFoundError
+            with entry_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        return data
+
+    def put(self, path: str, payload: dict, response: dict, tag: str = "") -> None:
+        entry_path = self._path(cache_key(path, payload, tag))
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry_path.with_suffix(f".{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(response, f, ensure_ascii=False)
+        os.replace(tmp, entry_path)
+        with self._lock:
+            self.stats["stores"] += 1
+
+    def evict(self) -> int:
+        """Poista vanhentuneet ja, kunnes koko mahtuu rajaan, vanhimmat merkinnät."""
+        if not self.directory.exists():
+            return 0
+        now = time.time()
+        entries = []
+        for p in self.directory.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, p in entries:
+            expired = self.ttl is not None and now - mtime > self.ttl
+            if not expired and total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        with self._lock:
+            self.stats["evicted"] += removed
+        return removed
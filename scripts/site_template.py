@@ -0,0 +1,228 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import functools
+import os
+import re
+import time
+
+from image_pipeline import hero_image_html, optimize_image
+from post_manifest import POSTS_DIR, ROOT, PostManifest, extract_title, post_category
+from post_similarity import SimilarityIndex
+
+
+# Artikkelisivun pohja: partials/post.html ja sen {% include "..." %} -osat
+# (navigaatio, jakolinkit, sivupalkki, alatunniste). Pohja käännetään kerran
+# prosessia kohden valmiiksi format-merkkijonoksi, joten renderöinti on yksi
+# str.format_map-kutsu. Komentorivi renderöi kaikki tallennetut artikkelit,
+# myös vanhat posts/*.html-tiedostot, nykyiseen pohjaan prosessipoolissa:
+#
+#   python scripts/site_template.py --dry-run
+#   python scripts/site_template.py
+
+PARTIALS_DIR = ROOT / "partials"
+IMAGES_DIR = ROOT / "assets" / "images"
+POST_TEMPLATE = "post.html"
+
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", str(os.cpu_count() or 2)))
+RENDER_CHUNKSIZE = 16
+
+_TOKEN_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}|\{%\s*include\s+"([\w.-]+)"\s*%\}')
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class Template:
+    """Käännetty pohja: {{ nimi }} -paikat ja include-osat yhdeksi format-merkkijonoksi."""
+
+    def __init__(self, name: str, partials_dir: Path = PARTIALS_DIR):
+        self.name = name
+        self.fields: set[str] = set()
+        # Kaikki pohjan tiedostot (include-osat mukaan lukien) koonnin syötteiksi.
+        self.sources: list[str] = []
+        self._format = self._compile(name, partials_dir, ()).format_map
+
+    def _compile(self, name: str, partials_dir: Path, stack: tuple) -> str:
+        if name in stack:
+            raise TemplateError(f"kehäviittaus pohjissa: {' -> '.join(stack + (name,))}")
+        source = (partials_dir / name).read_text(encoding="utf-8")
+        self.sources.append(name)
+        # Tiedoston viimeinen rivinvaihto ei kuulu osaan (kuten Jinjassa).
+        if source.endswith("\n"):
+            source = source[:-1]
+
+        parts = []
+        pos = 0
+        for match in _TOKEN_RE.finditer(source):
+            parts.append(source[pos:match.start()].replace("{", "{{").replace("}", "}}"))
+            field, include = match.groups()
+            if field:
+                self.fields.add(field)
+                parts.append("{" + field + "}")
+            else:
+                parts.append(self._compile(include, partials_dir, stack + (name,)))
+            pos = match.end()
+        parts.append(source[pos:].replace("{", "{{").replace("}", "}}"))
+        return "".join(parts)
+
+    def render(self, **context: str) -> str:
+        try:
+            return self._format(context)
+        except KeyError as e:
+            raise TemplateError(f"pohjasta {self.name} puuttuu arvo {e}") from None
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(name: str, partials_dir: Path = PARTIALS_DIR) -> Template:
+    return Template(name, partials_dir)
+
+
+def post_template_sources(partials_dir: Path = PARTIALS_DIR) -> list[Path]:
+    """Artikkelisivun renderöintiin vaikuttavat pohjatiedostot."""
+    names = load_template(POST_TEMPLATE, partials_dir).sources + ["post-hero.html", "related.html"]
+    return [partials_dir / name for name in names]
+
+
+def render_post(title: str, kind: str, body: str, post_url: str,
+                image_src: str = "", related: list[tuple[str, str]] = ()) -> str:
+    """Koko artikkelisivu; sama syöte tuottaa aina samat tavut."""
+    hero = ""
+    if image_src:
+        hero = load_template("post-hero.html").render(
+            image=hero_image_html(image_src, f"{title} – kuvituskuva")
+        ) + "\n"
+    related_html = ""
+    if related:
+        items = "\n".join(f'            <li><a href="{href}">{rtitle}</a></li>' for href, rtitle in related)
+        related_html = load_template("related.html").render(items=items)
+    return load_template(POST_TEMPLATE).render(
+        title=title, kind=kind, body=body.strip(), post_url=post_url, hero=hero, related=related_html,
+    ) + "\n"
+
+
+_TAGLINE_RE = re.compile(r'<p class="tagline">[^<(]*\(([^)<]+)\)\.?</p>')
+_HERO_RE = re.compile(r'<figure class="post-hero">.*?</figure>', re.S)
+_IMG_SRC_RE = re.compile(r'<img src="([^"]+)"')
+_RELATED_RE = re.compile(r'<h2>Suositellut jutut</h2>.*?</ul>', re.S)
+_RELATED_ITEM_RE = re.compile(r'<li><a href="([^"]+)">(.*?)</a></li>', re.S)
+
+
+def parse_post(document: str) -> dict | None:
+    """Tallennetun sivun sisältö: otsikko, kategoria, leipäteksti, kuva ja suositukset.
+
+    Toimii kaikilla arkiston pohjaversioilla. None, jos sivulla ei ole pääsaraketta.
+    """
+    start = document.find('class="main-column"')
+    if start == -1:
+        return None
+    start = document.find(">", start) + 1
+    aside = document.find('<aside class="sidebar">', start)
+    end = document.rfind("</section>", start, aside if aside != -1 else len(document))
+    column = document[start:end if end != -1 else len(document)]
+
+    image_src = ""
+    hero = _HERO_RE.search(column)
+    if hero:
+        img = _IMG_SRC_RE.search(hero.group(0))
+        image_src = img.group(1) if img else ""
+        column = column[:hero.start()] + column[hero.end():]
+
+    card = column.find('<div class="card">')
+    body = column if card == -1 else column[:card]
+    related = []
+    block = _RELATED_RE.search(column, card) if card != -1 else None
+    if block:
+        related = _RELATED_ITEM_RE.findall(block.group(0))
+
+    tagline = _TAGLINE_RE.search(document, 0, start)
+    return {
+        "title": extract_title(document),
+        "kind": tagline.group(1) if tagline else None,
+        "body": body.strip(),
+        "image_src": image_src,
+        "related": related,
+    }
+
+
+def _rerender_file(path_str: str, dry_run: bool = False) -> tuple[str, str]:
+    """Renderöi yksi tallennettu sivu uudelleen. Palauttaa (polku, changed|unchanged|skipped)."""
+    path = Path(path_str)
+    try:
+        original = path.read_bytes()
+    except OSError:
+        return path_str, "skipped"
+    post = parse_post(original.decode("utf-8"))
+    if post is None:
+        return path_str, "skipped"
+
+    relative = path.relative_to(ROOT).as_posix()
+    document = render_post(
+        title=post["title"],
+        kind=post["kind"] or post_category(path, POSTS_DIR),
+        body=post["body"],
+        post_url=f"https://aisuomi.blog/{relative}",
+        image_src=post["image_src"],
+        related=post["related"],
+    ).encode("utf-8")
+    if document == original:
+        return path_str, "unchanged"
+    if not dry_run:
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(document)
+        os.replace(tmp, path)
+    return path_str, "changed"
+
+
+def rerender_site(workers: int = RENDER_WORKERS, dry_run: bool = False,
+                  manifest: PostManifest | None = None) -> dict[str, list[str]]:
+    """Renderöi kaikki manifestin artikkelit nykyiseen pohjaan rinnakkain."""
+    if manifest is None:
+        manifest = PostManifest.load()
+    paths = [str(ROOT / key) for key in manifest.all_paths()]
+
+    # Kuvaversiot tehdään etukäteen, jotta työprosessit vain lukevat
+    # data/image_variants.json-tiedostoa eivätkä kirjoita sitä yhtä aikaa.
+    if IMAGES_DIR.exists():
+        for image in sorted(IMAGES_DIR.glob("*/*.png")):
+            optimize_image(image)
+
+    results: dict[str, list[str]] = {"changed": [], "unchanged": [], "skipped": []}
+    started = time.perf_counter()
+    if workers > 1 and len(paths) > RENDER_CHUNKSIZE:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outcomes = pool.map(_rerender_file, paths, [dry_run] * len(paths), chunksize=RENDER_CHUNKSIZE)
+            for path_str, outcome in outcomes:
+                results[outcome].append(path_str)
+    else:
+        for path_str in paths:
+            _, outcome = _rerender_file(path_str, dry_run)
+            results[outcome].append(path_str)
+    elapsed = time.perf_counter() - started
+
+    rendered = len(paths) - len(results["skipped"])
+    rate = rendered / elapsed if elapsed > 0 else 0.0
+    verb = "muuttuisi" if dry_run else "muuttui"
+    print(f"Renderöity {rendered} sivua {elapsed:.2f} s ({rate:.0f} sivua/s, {workers} prosessia): "
+          f"{verb} {len(results['changed'])}, ennallaan {len(results['unchanged'])}, "
+          f"ohitettu {len(results['skipped'])}")
+
+    if results["changed"] and not dry_run:
+        for path_str in results["changed"]:
+            manifest.update(Path(path_str))
+        manifest.save()
+        SimilarityIndex.load(manifest).save()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Renderöi kaikki artikkelit nykyiseen sivupohjaan.")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS, help="prosessien määrä")
+    parser.add_argument("--dry-run", action="store_true", help="älä kirjoita, kerro vain mitkä muuttuisivat")
+    args = parser.parse_args()
+    rerender_site(max(1, args.workers), args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+from datetime import datetime
+from pathlib import Path
+import html
+import json
+
+from build_graph import BuildGraph, fingerprint, write_if_changed
+from index_pages import INDEXES
+from post_manifest import ROOT, PostManifest
+
+
+# Sivukartta: sitemap.xml on sivukarttaindeksi, joka listaa osat sitemaps/-hakemistossa.
+# Osat ovat vakaita ryhmiä (sivut.xml = yläsivut ja listasivut, posts-YYYY.xml =
+# vuoden artikkelit kaikista hakemistoista), joten uusi juttu muuttaa vain oman
+# vuotensa osan ja indeksin. Ryhmä jaetaan osiin (posts-2026-2.xml ...), jos se
+# ylittää protokollan rajat (50 000 osoitetta tai 50 Mt).
+#
+# lastmod ei tule tiedoston mtimesta (actions/checkout nollaa sen), vaan
+# tiedostosta data/sitemap_state.json: {polku: {sisällön tiiviste, lastmod}}.
+# lastmod vaihtuu vain, kun sivun sisältö muuttuu; artikkelin ensimmäinen
+# lastmod on sen julkaisupäivä.
+
+BASE_URL = "https://aisuomi.blog"
+SITEMAP_FILE = ROOT / "sitemap.xml"
+SITEMAPS_DIR = ROOT / "sitemaps"
+STATE_PATH = ROOT / "data" / "sitemap_state.json"
+
+SITEMAP_MAX_URLS = 50_000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+
+# Yläsivut, joita ei haluta hakukoneisiin (Search Consolen vahvistustiedosto).
+EXCLUDED_PAGES = ("google",)
+
+_URLSET_HEAD = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+_URLSET_TAIL = "</urlset>\n"
+
+
+def page_url(key: str, base_url: str = BASE_URL) -> str:
+    return f"{base_url}/" if key == "index.html" else f"{base_url}/{key}"
+
+
+def site_pages(root: Path = ROOT) -> list[Path]:
+    """Yläsivut ja etusivun/kategorioiden arkistosivut."""
+    pages = [p for p in root.glob("*.html") if not p.name.startswith(EXCLUDED_PAGES)]
+    for _, directory, _, _ in INDEXES.values():
+        pages += (root / directory).glob("*.html")
+    return sorted(pages)
+
+
+def load_state(path: Path = STATE_PATH) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def update_lastmods(state: dict, hashes: dict[str, tuple[str, str]], today: str) -> bool:
+    """hashes: {polku: (tiiviste, ensimmäinen lastmod)}. Palauttaa True, jos tila muuttui."""
+    changed = False
+    for key in [k for k in state if k not in hashes]:
+        del state[key]
+        changed = True
+    for key, (sha, first) in hashes.items():
+        entry = state.get(key)
+        if entry is None:
+            state[key] = {"sha256": sha, "lastmod": first}
+        elif entry["sha256"] != sha:
+            state[key] = {"sha256": sha, "lastmod": today}
+        else:
+            continue
+        changed = True
+    return changed
+
+
+def render_url(loc: str, lastmod: str) -> str:
+    return f"  <url>\n    <loc>{html.escape(loc)}</loc>\n    <lastmod>{lastmod}</lastmod>\n  </url>\n"
+
+
+def split_shard(urls: list[str], max_urls: int = SITEMAP_MAX_URLS, max_bytes: int = SITEMAP_MAX_BYTES) -> list[list[str]]:
+    """Jaa ryhmän <url>-rivit osiin, joista kukin mahtuu protokollan rajoihin."""
+    overhead = len(_URLSET_HEAD) + len(_URLSET_TAIL)
+    parts, current, size = [], [], overhead
+    for url in urls:
+        url_bytes = len(url.encode("utf-8"))
+        if current and (len(current) >= max_urls or size + url_bytes > max_bytes):
+            parts.append(current)
+            current, size = [], overhead
+        current.append(url)
+        size += url_bytes
+    if current:
+        parts.append(current)
+    return parts
+
+
+def render_index(shards: list[tuple[str, str]], base_url: str = BASE_URL) -> str:
+    entries = "".join(
+        f"  <sitemap>\n    <loc>{base_url}/{key}</loc>\n    <lastmod>{lastmod}</lastmod>\n  </sitemap>\n"
+        for key, lastmod in shards
+    )
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            f"{entries}</sitemapindex>\n")
+
+
+def build_sitemap(graph: BuildGraph, manifest: PostManifest, state_path: Path = STATE_PATH) -> None:
+    """Päivitä lastmod-tila ja kokoa muuttuneet osat sekä indeksi graafin kohteina."""
+    today = datetime.utcnow().date().isoformat()
+    posts = manifest.posts()
+
+    # Ryhmä -> [(polku, tiiviste, ensimmäinen lastmod)]; sivut ensin, vuodet uusin ensin.
+    groups: dict[str, list[tuple[str, str, str]]] = {"sivut": []}
+    for path in site_pages(graph.root):
+        groups["sivut"].append((graph.key(path), graph.file(path), today))
+    for key, entry in posts:
+        groups.setdefault(f"posts-{entry['date'][:4]}", []).append((key, entry["sha256"], entry["date"]))
+
+    state = load_state(state_path)
+    hashes = {key: (sha, first) for rows in groups.values() for key, sha, first in rows}
+    if update_lastmods(state, hashes, today):
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        with state_path.open("w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    recipe = {"scripts/sitemap.py": graph.file(Path(__file__))}
+    shards: list[tuple[str, str]] = []
+    for group, rows in groups.items():
+        urls = [render_url(page_url(key), state[key]["lastmod"]) for key, _, _ in rows]
+        lastmods = [state[key]["lastmod"] for key, _, _ in rows]
+        offset = 0
+        for number, part in enumerate(split_shard(urls), start=1):
+            shard_path = SITEMAPS_DIR / (f"{group}.xml" if number == 1 else f"{group}-{number}.xml")
+            shard_key = graph.key(shard_path)
+            part_lastmods = lastmods[offset:offset + len(part)]
+            offset += len(part)
+            shards.append((shard_key, max(part_lastmods)))
+
+            graph.build(
+                shard_key,
+                lambda part=part: {"osoitteet": fingerprint("".join(part)), **recipe},
+                lambda part=part, shard_path=shard_path: write_if_changed(
+                    shard_path, _URLSET_HEAD + "".join(part) + _URLSET_TAIL
+                ),
+                outputs=[shard_path],
+            )
+
+    # Osat, joita ei enää ole (esim. poistetun vuoden artikkelit).
+    current = {key for key, _ in shards}
+    if SITEMAPS_DIR.exists():
+        for stale in SITEMAPS_DIR.glob("*.xml"):
+            if graph.key(stale) not in current:
+                stale.unlink()
+                graph.forget(graph.key(stale))
+
+    graph.build(
+        SITEMAP_FILE.name,
+        lambda: {**dict(shards), **recipe},
+        lambda: write_if_changed(SITEMAP_FILE, render_index(shards)),
+        outputs=[SITEMAP_FILE],
+    )
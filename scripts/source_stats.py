@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import json
+
+
+# Lähdekohtaiset hakutilastot ja katkaisija (circuit breaker). Tila tallennetaan
+# tiedostoon data/source_stats.json, joka toimii samalla luettavana raporttina.
+
+# Montako viimeisintä hakuaikaa pidetään prosenttipisteitä varten.
+LATENCY_SAMPLES = 50
+
+# Peräkkäisten epäonnistumisten määrä, jonka jälkeen lähde ohitetaan.
+BREAKER_THRESHOLD = 3
+# Ensimmäinen tauko; jokainen uusi epäonnistunut koeyritys tuplaa sen.
+BREAKER_BASE_BACKOFF = timedelta(hours=12)
+BREAKER_MAX_BACKOFF = timedelta(days=14)
+
+# Tuottoon perustuva hakuaikataulu. Workflow ajetaan noin 12 tunnin välein;
+# lähde, joka tuo keskimäärin vähintään yhden uuden Suomi-uutisen per haku,
+# haetaan joka ajolla. Mitä pienempi tuotto, sitä harvemmin, kuitenkin
+# vähintään MAX_STALENESS välein.
+RUN_INTERVAL = timedelta(hours=12)
+# Ajoajat heiluvat hieman, joten erääntymiseen sallitaan pelivaraa.
+SCHEDULE_SLACK = timedelta(hours=1)
+# Näin monen onnistuneen haun jälkeen tuottoa pidetään luotettavana.
+MIN_FETCHES_FOR_SCHEDULE = 4
+
+
+def load_stats(path: Path) -> dict:
+    if not path.exists():
+        return {"sources": {}}
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return {"sources": {}}
+    if not isinstance(data, dict) or not isinstance(data.get("sources"), dict):
+        return {"sources": {}}
+    return data
+
+
+def save_stats(path: Path, stats: dict, now: datetime) -> None:
+    stats["generated_at"] = now.isoformat(timespec="seconds")
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _entry(stats: dict, src: dict) -> dict:
+    entry = stats["sources"].setdefault(src["url"], {})
+    entry["name"] = src["name"]
+    entry.setdefault("latencies_ms", [])
+    for key in ("fetches", "failures", "consecutive_failures", "not_modified",
+                "bozo", "bytes_total", "entries_seen", "hits", "new_items"):
+        entry.setdefault(key, 0)
+    return entry
+
+
+def _percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def breaker_state(stats: dict, src: dict, now: datetime) -> tuple[bool, str | None]:
+    """(haetaanko lähde, seuraavan koeyrityksen aika jos ohitetaan)."""
+    entry = stats["sources"].get(src["url"])
+    if not entry or not entry.get("next_probe_at"):
+        return True, None
+    try:
+        next_probe = datetime.fromisoformat(entry["next_probe_at"])
+    except ValueError:
+        return True, None
+    if now >= next_probe:
+        return True, None
+    return False, entry["next_probe_at"]
+
+
+def record_fetch(stats: dict, src: dict, result: dict, now: datetime,
+                 entries_seen: int = 0, hits: int = 0, new_items: int = 0) -> None:
+    """Päivitä lähteen tilastot yhden haun tuloksella ja avaa/sulje katkaisija."""
+    entry = _entry(stats, src)
+    entry["fetches"] += 1
+    entry["last_fetch_at"] = now.isoformat(timespec="seconds")
+    entry["last_status"] = result.get("status")
+    entry["last_error"] = result.get("error")
+
+    if result.get("elapsed") is not None:
+        entry["latencies_ms"] = (entry["latencies_ms"] + [round(result["elapsed"] * 1000)])[-LATENCY_SAMPLES:]
+    entry["bytes_total"] += result.get("wire_bytes", 0)
+    entry["last_bytes"] = result.get("wire_bytes", 0)
+
+    if result.get("error"):
+        entry["failures"] += 1
+        entry["consecutive_failures"] += 1
+        if entry["consecutive_failures"] >= BREAKER_THRESHOLD:
+            exponent = entry["consecutive_failures"] - BREAKER_THRESHOLD
+            backoff = min(BREAKER_BASE_BACKOFF * (2 ** exponent), BREAKER_MAX_BACKOFF)
+            entry["next_probe_at"] = (now + backoff).isoformat(timespec="seconds")
+    else:
+        entry["consecutive_failures"] = 0
+        entry["next_probe_at"] = None
+        if result.get("not_modified"):
+            entry["not_modified"] += 1
+        if result.get("bozo") is not None:
+            entry["bozo"] += 1
+        entry["entries_seen"] += entries_seen
+        entry["hits"] += hits
+        entry["new_items"] += new_items
+
+    successes = entry["fetches"] - entry["failures"]
+    entry["bozo_rate"] = round(entry["bozo"] / successes, 3) if successes else None
+    entry["hit_rate"] = round(entry["hits"] / entry["entries_seen"], 4) if entry["entries_seen"] else None
+    entry["latency_ms"] = {
+        "p50": _percentile(entry["latencies_ms"], 50),
+        "p90": _percentile(entry["latencies_ms"], 90),
+        "p99": _percentile(entry["latencies_ms"], 99),
+    }
+
+
+def poll_interval(entry: dict | None, max_staleness: timedelta) -> timedelta:
+    """Lähteen hakuväli historiallisen tuoton (uudet osumat per haku) perusteella."""
+    if not entry:
+        return RUN_INTERVAL
+    successes = entry.get("fetches", 0) - entry.get("failures", 0)
+    if successes < MIN_FETCHES_FOR_SCHEDULE:
+        return RUN_INTERVAL
+    yield_per_fetch = entry.get("new_items", 0) / successes
+    if yield_per_fetch <= 0:
+        return max_staleness
+    return max(RUN_INTERVAL, min(max_staleness, RUN_INTERVAL / yield_per_fetch))
+
+
+def schedule_sources(stats: dict, sources: list[dict], now: datetime,
+                     budget: int | None, max_staleness: timedelta) -> tuple[list[dict], int]:
+    """Valitse tämän ajon haettavat lähteet. Palauttaa (valitut SOURCES-järjestyksessä, lykätyt).
+
+    Erääntyneet lähteet järjestetään sen mukaan, kuinka moninkertaisesti niiden
+    hakuväli on ylittynyt, ja budjetti täytetään kärjestä. Lähde, jota ei ole
+    haettu max_staleness-aikaan, haetaan aina budjetista riippumatta.
+    """
+    forced: list[int] = []
+    due: list[tuple[float, int]] = []
+
+    for pos, src in enumerate(sources):
+        entry = stats["sources"].get(src["url"])
+        last = None
+        if entry and entry.get("last_fetch_at"):
+            try:
+                last = datetime.fromisoformat(entry["last_fetch_at"])
+            except ValueError:
+                last = None
+        if last is None:
+            forced.append(pos)
+            continue
+
+        elapsed = now - last + SCHEDULE_SLACK
+        interval = poll_interval(entry, max_staleness)
+        if elapsed >= max_staleness:
+            forced.append(pos)
+        elif elapsed >= interval:
+            due.append((elapsed / interval, pos))
+
+    due.sort(key=lambda pair: (-pair[0], pair[1]))
+    room = len(due) if budget is None else max(0, budget - len(forced))
+    chosen = set(forced) | {pos for _, pos in due[:room]}
+    return [src for pos, src in enumerate(sources) if pos in chosen], len(sources) - len(chosen)